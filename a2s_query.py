@@ -0,0 +1,116 @@
+import os
+import asyncio
+import random
+import a2s
+import dns_resolver
+import metrics
+from a2s.a2s_async import A2SStreamAsync, request_async_impl
+from a2s.defaults import DEFAULT_ENCODING
+from a2s.info import InfoProtocol
+from a2s.players import PlayersProtocol
+from dotenv import load_dotenv
+from typing import Callable, Tuple
+
+# Query settings
+QUERY_TIMEOUT = 3.0
+QUERY_RETRIES = 1
+RETRY_BACKOFF = 0.25
+
+# Every response is awaited with the library timeout, outer deadline is only for query stuck after the last one
+QUERY_TIMEOUT_SLACK = 0.5
+
+# How many live queries can wait for response at the same time
+load_dotenv()
+MAX_IN_FLIGHT_QUERIES = int(os.getenv("MAX_IN_FLIGHT_QUERIES", 64))
+
+_query_semaphore = asyncio.Semaphore(MAX_IN_FLIGHT_QUERIES)
+
+# Queries currently waiting for response, keyed by (address, query type)
+_in_flight_queries = {}
+
+# How many queries were sent to game servers and how many were served by an already running one
+query_counters = {"sent": 0, "coalesced": 0}
+
+
+async def _request(address: Tuple[str, int], timeout: float, protocol):
+    """Same request as a2s.ainfo and a2s.aplayers, but the socket is closed also when the query fails"""
+    stream = await A2SStreamAsync.create(address, timeout)
+
+    try:
+        return await request_async_impl(stream, DEFAULT_ENCODING, protocol)
+
+    finally:
+        stream.close()
+
+
+async def _info_request(address: Tuple[str, int], timeout: float):
+    return await _request(address, timeout, InfoProtocol)
+
+
+async def _players_request(address: Tuple[str, int], timeout: float):
+    return await _request(address, timeout, PlayersProtocol)
+
+
+async def _query(query_type: str, query_func: Callable, address: Tuple[str, int], timeout: float, retries: int):
+    """Run async A2S query with timeout and retries with jitter"""
+    address = await dns_resolver.resolver.resolve_address(address)
+
+    for attempt in range(retries + 1):
+        try:
+            async with _query_semaphore:
+                with metrics.A2S_QUERY_SECONDS.time(query=query_type):
+                    return await asyncio.wait_for(query_func(address, timeout=timeout), timeout + QUERY_TIMEOUT_SLACK)
+
+        except (TimeoutError, a2s.BrokenMessageError, OSError) as error:
+            metrics.A2S_QUERY_ERRORS.inc(query=query_type, error=metrics.error_type(error))
+
+            if attempt >= retries:
+                raise
+
+            # Full jitter so retries from many commands don't hit the server at the same moment
+            await asyncio.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+
+
+def _forget_query(key: Tuple, future: asyncio.Future):
+    """Remove finished query so the next request sends a fresh one"""
+    if _in_flight_queries.get(key) is future:
+        del _in_flight_queries[key]
+
+    # Mark exception as retrieved, waiters could be already cancelled
+    if not future.cancelled():
+        future.exception()
+
+
+async def _coalesced_query(query_type: str, query_func: Callable, address: Tuple[str, int], timeout: float,
+                           retries: int):
+    """Share one running query between all callers asking the same server for the same data"""
+    key = (address, query_type)
+    future = _in_flight_queries.get(key)
+
+    if future is None:
+        future = asyncio.ensure_future(_query(query_type, query_func, address, timeout, retries))
+        future.add_done_callback(lambda done: _forget_query(key, done))
+        _in_flight_queries[key] = future
+        query_counters["sent"] += 1
+
+    else:
+        query_counters["coalesced"] += 1
+
+    # Shield the shared query, so one cancelled caller doesn't cancel it for the others
+    return await asyncio.shield(future)
+
+
+async def server_info(address: Tuple[str, int], timeout: float = QUERY_TIMEOUT, retries: int = QUERY_RETRIES):
+    """Query game server info without blocking the event loop"""
+    return await _coalesced_query("info", _info_request, address, timeout, retries)
+
+
+async def server_players(address: Tuple[str, int], timeout: float = QUERY_TIMEOUT, retries: int = QUERY_RETRIES):
+    """Query game server players without blocking the event loop"""
+    return await _coalesced_query("players", _players_request, address, timeout, retries)
+
+
+metrics.Gauge("gamestatsbot_a2s_queries_sent_total", "Live A2S queries sent to game servers",
+              lambda: query_counters["sent"], "counter")
+metrics.Gauge("gamestatsbot_a2s_queries_coalesced_total", "Live A2S requests served by already running query",
+              lambda: query_counters["coalesced"], "counter")
@@ -0,0 +1,163 @@
+import logging
+import time
+import discord
+import health
+import database_handler as db
+from datetime import datetime
+from typing import Tuple, Union
+
+# Events which channel can subscribe to
+ALERT_EVENTS = {
+    "map": "Map changed",
+    "offline": "Server went offline or came back online",
+    "players": "Player count crossed threshold",
+    "full": "Server is full",
+}
+
+# Subscriptions added by other bot processes are loaded again after RELOAD_INTERVAL (seconds)
+RELOAD_INTERVAL = 60.0
+MAX_ALERT_LINES = 30
+
+logger = logging.getLogger(__name__)
+
+
+class ServerState:
+    """Fields of the last poll snapshot which alerts are evaluated on"""
+
+    def __init__(self, online: bool, game_map: str = None, player_count: int = 0, max_players: int = 0):
+        self.online = online
+        self.game_map = game_map
+        self.player_count = player_count
+        self.max_players = max_players
+
+
+class AlertManager:
+    """Compares successive poll snapshots of subscribed servers and sends alerts in one message per channel"""
+
+    def __init__(self, health_tracker: health.HealthTracker = health.tracker, reload_interval: float = RELOAD_INTERVAL):
+        self.health = health_tracker
+        self.reload_interval = reload_interval
+        self.client = None
+        self.subscriptions = {}
+        self.states = {}
+        self._pending = {}
+        self._loaded_at = 0.0
+
+    async def load(self):
+        """Load all subscriptions and index them by endpoint and event"""
+        subscriptions = {}
+
+        for alert in await db.all_alerts():
+            subscriptions.setdefault((alert["ip"], alert["port"]), {}).setdefault(alert["event"], []).append(alert)
+
+        self.subscriptions = subscriptions
+        self._loaded_at = time.monotonic()
+
+        # Servers without subscriptions aren't watched
+        for address in [address for address in self.states if address not in subscriptions]:
+            del self.states[address]
+
+    async def subscribe(self, guild_id: int, channel_id: int, server_name: str, server_info: dict, event: str,
+                        threshold: int = None):
+        alert = await db.add_alert(guild_id, channel_id, server_name, server_info["ip"], server_info["port"], event,
+                                   threshold)
+        alerts = self.subscriptions.setdefault((alert["ip"], alert["port"]), {}).setdefault(event, [])
+        alerts[:] = [subscribed for subscribed in alerts
+                     if (subscribed["channel_id"], subscribed["server_name"]) != (channel_id, server_name)]
+        alerts.append(alert)
+
+    async def unsubscribe(self, channel_id: int, server_name: str, event: str) -> Union[dict, None]:
+        alert = await db.del_alert(channel_id, server_name, event)
+
+        if alert:
+            alerts = self.subscriptions.get((alert["ip"], alert["port"]), {}).get(event, [])
+            alerts[:] = [subscribed for subscribed in alerts
+                         if (subscribed["channel_id"], subscribed["server_name"]) != (channel_id, server_name)]
+
+        return alert
+
+    def forget(self, guild_id: int, server_name: str):
+        """Drop subscriptions of game server deleted from discord server, database removes them by itself"""
+        for events in self.subscriptions.values():
+            for alerts in events.values():
+                alerts[:] = [subscribed for subscribed in alerts
+                             if (subscribed["guild_id"], subscribed["server_name"]) != (guild_id, server_name)]
+
+    def _queue(self, alerts: list, message: str):
+        for alert in alerts:
+            self._pending.setdefault(alert["channel_id"], []).append(f"**{alert['server_name']}** {message}")
+
+    async def record(self, address: Tuple[str, int], info, players):
+        """Poller listener, evaluates only rules of events which fields changed since previous poll"""
+        events = self.subscriptions.get(address)
+
+        if not events:
+            return
+
+        if info is not None:
+            state = ServerState(True, info.map_name, info.player_count, info.max_players)
+
+        else:
+            # Single lost response doesn't make server offline, only open circuit of health tracker
+            server_health = self.health.get(address)
+
+            if server_health is None or not server_health.is_open:
+                return
+
+            state = ServerState(False)
+
+        previous = self.states.get(address)
+        self.states[address] = state
+
+        # First snapshot of server is only compared with the next one
+        if previous is None:
+            return
+
+        if state.online != previous.online:
+            self._queue(events.get("offline", []), "came back online" if state.online else "went offline")
+
+        if not state.online or not previous.online:
+            return
+
+        if state.game_map != previous.game_map:
+            self._queue(events.get("map", []), f"changed map to `{state.game_map}`")
+
+        if state.player_count != previous.player_count:
+            for alert in events.get("players", []):
+                if previous.player_count < alert["threshold"] <= state.player_count:
+                    self._queue([alert], f"has {state.player_count} players, threshold {alert['threshold']} reached")
+
+                elif state.player_count < alert["threshold"] <= previous.player_count:
+                    self._queue([alert], f"dropped to {state.player_count} players, below {alert['threshold']}")
+
+            if state.max_players and previous.player_count < state.max_players <= state.player_count:
+                self._queue(events.get("full", []), f"is full {state.player_count}/{state.max_players}")
+
+    async def flush(self):
+        """Poller cycle listener sending all alerts of one channel in one message"""
+        if time.monotonic() - self._loaded_at > self.reload_interval:
+            await self.load()
+
+        pending, self._pending = self._pending, {}
+
+        for channel_id, lines in pending.items():
+            if len(lines) > MAX_ALERT_LINES:
+                lines = lines[:MAX_ALERT_LINES] + [f"and {len(lines) - MAX_ALERT_LINES} more"]
+
+            embed = discord.Embed(title=":bell: Server Alerts", description="\n".join(lines),
+                                  color=discord.Color.orange())
+            embed.timestamp = datetime.utcnow()
+
+            try:
+                await self.client.get_partial_messageable(channel_id).send(embed=embed)
+
+            # Channel was deleted or bot can't write to it anymore
+            except (discord.NotFound, discord.Forbidden):
+                await db.del_channel_alerts(channel_id)
+                await self.load()
+
+            except discord.HTTPException as error:
+                logger.warning("Sending alerts to channel %s failed: %r", channel_id, error)
+
+
+manager = AlertManager()
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import health
+import thumbnails
+import validators
+import server_cache
+import database_handler as db
+import memory_db
+from fake_a2s import start_fake_servers
+
+COMMANDS = ("stats", "players", "servers", "add_server")
+
+
+class FakeContext:
+    """Stand-in for discord context, send waits send_latency like a request to discord"""
+
+    def __init__(self, guild_id: int, send_latency: float):
+        self.guild = SimpleNamespace(id=guild_id)
+        self.channel = SimpleNamespace(id=guild_id)
+        self.author = SimpleNamespace(id=guild_id, roles=[SimpleNamespace(name=validators.DISCORD_MANAGE_ROLE)])
+        self.command = None
+        self.send_latency = send_latency
+
+    async def send(self, content=None, embed=None, embeds=None, file=None, **kwargs):
+        await asyncio.sleep(self.send_latency)
+
+        # Discord replaces attachment url in embed with url of uploaded file
+        if embed and file:
+            embed.set_image(url=f"https://cdn.discordapp.com/attachments/1/1/{file.filename}")
+
+        return SimpleNamespace(id=random.getrandbits(63), embeds=[embed] if embed else embeds or [])
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[round(fraction * (len(sorted_values) - 1))]
+
+
+async def create_guild(guild_id: int, addresses: list):
+    """Guild with one game server for every address"""
+    await db.create_default_config(guild_id)
+
+    for index, (ip, port) in enumerate(addresses):
+        await db.add_game_server(guild_id, f"server{index}", ip, port, "Benchmark server")
+
+
+async def run_scenario(command: str, guild_id: int, server_count: int, concurrency: int, requests: int,
+                       send_latency: float) -> dict:
+    """Run requests command calls with concurrency workers and measure latency of every call"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def invoke(call_number: int):
+        ctx = FakeContext(guild_id, send_latency)
+        server_name = f"server{random.randrange(server_count)}"
+
+        if command == "stats":
+            await main.server_stats_func.callback(ctx, server_name)
+
+        elif command == "players":
+            await main.players_info_func.callback(ctx, server_name)
+
+        elif command == "servers":
+            await main.servers_list_func.callback(ctx)
+
+        elif command == "add_server":
+            await main.add_server_func.callback(ctx, f"added{concurrency}-{call_number}", "127.0.0.1:27015",
+                                                "Benchmark", "server")
+
+    async def worker():
+        nonlocal errors
+
+        for call_number in remaining:
+            started = time.perf_counter()
+
+            try:
+                await invoke(call_number)
+
+            except Exception:
+                errors += 1
+
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    return {
+        "command": command,
+        "servers_per_guild": server_count,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "commands_per_second": round(requests / elapsed, 1),
+    }
+
+
+async def run(args) -> list:
+    if args.mongodb:
+        db.DATABASE_NAME = "GameStatsBotBenchmark"
+        await db.connect(args.mongodb)
+
+    else:
+        memory_db.install(args.db_latency)
+
+    thumbnails.index.load()
+
+    # Without snapshot cache every command sends live query through a2s_query
+    if args.live:
+        server_cache.snapshots.ttl = 0
+
+    fake_servers = await start_fake_servers(max(args.servers), latency=args.a2s_latency, loss=args.a2s_loss)
+    addresses = [server.address for _, server in fake_servers]
+    results = []
+
+    for guild_id, server_count in enumerate(args.servers, start=1):
+        await create_guild(guild_id, addresses[:server_count])
+
+        for command in args.commands:
+            for concurrency in args.concurrency:
+                result = await run_scenario(command, guild_id, server_count, concurrency, args.requests,
+                                            args.send_latency)
+                results.append(result)
+                print(json.dumps(result), file=sys.stderr)
+
+                # Lost packets shouldn't make servers offline for the following scenarios
+                health.tracker.endpoints.clear()
+
+    for transport, _ in fake_servers:
+        transport.close()
+
+    if args.mongodb:
+        db.db_client.drop_database(db.DATABASE_NAME)
+        db.close()
+
+    return results
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Latency and throughput of bot commands with local stand-ins")
+    parser.add_argument("--commands", nargs="+", choices=COMMANDS, default=list(COMMANDS))
+    parser.add_argument("--servers", nargs="+", type=int, default=[1, 10, 100], help="servers per guild")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=500, help="command calls per scenario")
+    parser.add_argument("--a2s-latency", type=float, default=0.02)
+    parser.add_argument("--a2s-loss", type=float, default=0.0)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="latency of in-memory database stand-in")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="latency of sending message to discord")
+    parser.add_argument("--mongodb", help="connection string of local mongod instead of in-memory stand-in")
+    parser.add_argument("--live", action="store_true", help="disable snapshot cache, query servers every time")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "commands",
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("mongodb", "output")},
+        "database": "mongodb" if args.mongodb else "memory",
+        "results": asyncio.run(run(args)),
+    }
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=4)
+
+    else:
+        print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main_benchmark()
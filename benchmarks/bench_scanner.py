@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scanner
+from fake_a2s import start_fake_servers
+
+
+async def run(endpoints: int, players: int, packets_per_second: int, sockets: int, latency: float, loss: float):
+    # Half of servers behaves like Source and half like GoldSource, big player lists are split into more packets
+    servers = await start_fake_servers(endpoints // 2, engine="source", player_count=players, latency=latency,
+                                       loss=loss, mtu=512)
+    servers += await start_fake_servers(endpoints - endpoints // 2, engine="goldsource", player_count=players,
+                                        latency=latency, loss=loss, mtu=512)
+    addresses = [server.address for _, server in servers]
+
+    a2s_scanner = scanner.A2SScanner(sockets=sockets, packets_per_second=packets_per_second)
+    await a2s_scanner.open()
+
+    started = time.perf_counter()
+    results = await a2s_scanner.scan(addresses)
+    elapsed = time.perf_counter() - started
+
+    a2s_scanner.close()
+
+    for transport, _ in servers:
+        transport.close()
+
+    failed = [result for result in results.values() if isinstance(result, Exception)]
+    complete = [result for result in results.values()
+                if not isinstance(result, Exception) and len(result[1]) == players]
+
+    return {
+        "benchmark": "scanner",
+        "endpoints": endpoints,
+        "players_per_server": players,
+        "sockets": sockets,
+        "packets_per_second_budget": packets_per_second,
+        "latency": latency,
+        "loss": loss,
+        "scan_seconds": round(elapsed, 3),
+        "endpoints_per_second": round(endpoints / elapsed, 1),
+        "succeeded": len(complete),
+        "failed": len(failed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan time of local fake A2S servers")
+    parser.add_argument("--endpoints", type=int, default=5000)
+    parser.add_argument("--players", type=int, default=32)
+    parser.add_argument("--packets-per-second", type=int, default=20000)
+    parser.add_argument("--sockets", type=int, default=scanner.SCANNER_SOCKETS)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Every fake server needs its own socket
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard_limit, max(soft_limit, args.endpoints + 256)), hard_limit))
+
+    result = asyncio.run(run(args.endpoints, args.players, args.packets_per_second, args.sockets, args.latency,
+                             args.loss))
+    print(json.dumps(result, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import asyncio
+import random
+import struct
+
+HEADER_SIMPLE = b"\xFF\xFF\xFF\xFF"
+HEADER_SPLIT = b"\xFE\xFF\xFF\xFF"
+
+
+def cstring(value: str) -> bytes:
+    return value.encode() + b"\x00"
+
+
+class FakeA2SServer(asyncio.DatagramProtocol):
+    """Local stand-in for Source or GoldSource game server answering A2S_INFO and A2S_PLAYER"""
+
+    def __init__(self, engine: str = "source", map_name: str = "de_dust2", player_count: int = 10,
+                 max_players: int = 64, latency: float = 0.0, loss: float = 0.0, mtu: int = 1248,
+                 challenge: bool = True):
+        self.engine = engine
+        self.map_name = map_name
+        self.players = [(f"player{index}", index * 3, 60.0 * index) for index in range(player_count)]
+        self.max_players = max_players
+        self.latency = latency
+        self.loss = loss
+        self.mtu = mtu
+        self.challenge = random.getrandbits(32) if challenge else None
+        self.message_id = 0
+        self.transport = None
+        self.address = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.address = transport.get_extra_info("sockname")[:2]
+
+    def info_payload(self) -> bytes:
+        if self.engine == "goldsource":
+            return (b"m" + cstring(f"{self.address[0]}:{self.address[1]}") + cstring("Fake server")
+                    + cstring(self.map_name) + cstring("cstrike") + cstring("Counter-Strike")
+                    + bytes([len(self.players), self.max_players, 48]) + b"dl" + bytes([0, 0, 1, 0]))
+
+        return (b"I" + bytes([17]) + cstring("Fake server") + cstring(self.map_name) + cstring("cs2")
+                + cstring("Counter-Strike 2") + struct.pack("<H", 730)
+                + bytes([len(self.players), self.max_players, 0]) + b"dl" + bytes([0, 1]) + cstring("1.0.0"))
+
+    def players_payload(self) -> bytes:
+        payload = b"D" + bytes([len(self.players)])
+
+        for name, score, duration in self.players:
+            payload += bytes([0]) + cstring(name) + struct.pack("<lf", score, duration)
+
+        return payload
+
+    def packets(self, payload: bytes) -> list:
+        """Whole response as one packet or split in Source or GoldSource format"""
+        response = HEADER_SIMPLE + payload
+
+        if len(response) <= self.mtu:
+            return [response]
+
+        self.message_id += 1
+        chunks = [response[index:index + self.mtu] for index in range(0, len(response), self.mtu)]
+        packets = []
+
+        for number, chunk in enumerate(chunks):
+            if self.engine == "goldsource":
+                header = struct.pack("<LB", self.message_id, number << 4 | len(chunks))
+
+            else:
+                header = struct.pack("<LBBH", self.message_id, len(chunks), number, self.mtu)
+
+            packets.append(HEADER_SPLIT + header + chunk)
+
+        return packets
+
+    def response(self, request: bytes) -> bytes:
+        challenge_response = b"A" + struct.pack("<L", self.challenge or 0)
+
+        if request[:1] == b"T":
+            sent_challenge = request[len("TSource Engine Query\x00"):]
+
+            if self.challenge is not None and sent_challenge != struct.pack("<L", self.challenge):
+                return challenge_response
+
+            return self.info_payload()
+
+        if request[:1] == b"U":
+            if self.challenge is not None and request[1:5] != struct.pack("<L", self.challenge):
+                return challenge_response
+
+            return self.players_payload()
+
+        return b""
+
+    def datagram_received(self, data: bytes, address):
+        if data[:4] != HEADER_SIMPLE or random.random() < self.loss:
+            return
+
+        payload = self.response(data[4:])
+
+        if not payload:
+            return
+
+        for packet in self.packets(payload):
+            if self.latency:
+                asyncio.get_running_loop().call_later(self.latency, self.transport.sendto, packet, address)
+
+            else:
+                self.transport.sendto(packet, address)
+
+
+async def start_fake_servers(count: int, host: str = "127.0.0.1", **server_options) -> list:
+    """Start count fake servers on random ports, returns list of (transport, server)"""
+    loop = asyncio.get_running_loop()
+    servers = []
+
+    for _ in range(count):
+        servers.append(await loop.create_datagram_endpoint(lambda: FakeA2SServer(**server_options),
+                                                           local_addr=(host, 0)))
+
+    return servers
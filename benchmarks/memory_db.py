@@ -0,0 +1,211 @@
+import copy
+import time
+import threading
+import database_handler as db
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+
+def _get(document: dict, key: str):
+    for part in key.split("."):
+        if not isinstance(document, dict) or part not in document:
+            return None
+
+        document = document[part]
+
+    return document
+
+
+def _set(document: dict, key: str, value):
+    *parents, last = key.split(".")
+
+    for part in parents:
+        document = document.setdefault(part, {})
+
+    document[last] = value
+
+
+def _unset(document: dict, key: str):
+    *parents, last = key.split(".")
+
+    for part in parents:
+        document = document.get(part, {})
+
+    document.pop(last, None)
+
+
+def _matches(document: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        value = _get(document, key)
+
+        if isinstance(condition, dict) and condition and all(operator.startswith("$") for operator in condition):
+            for operator, operand in condition.items():
+                if operator == "$exists" and (value is not None) != operand:
+                    return False
+
+                elif operator == "$in" and value not in operand:
+                    return False
+
+                elif operator == "$gte" and (value is None or value < operand):
+                    return False
+
+        elif value != condition:
+            return False
+
+    return True
+
+
+def _project(document: dict, projection: dict = None) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+
+    included = [key for key, value in projection.items() if value and key != "_id"]
+
+    if included:
+        result = {key: copy.deepcopy(document[key]) for key in included if key in document}
+
+    else:
+        result = {key: copy.deepcopy(value) for key, value in document.items() if projection.get(key, 1)}
+
+    if projection.get("_id", 1) and "_id" in document:
+        result["_id"] = document["_id"]
+
+    return result
+
+
+class MemoryCursor(list):
+    def sort(self, key, direction=1):
+        super().sort(key=lambda document: document.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, count: int):
+        return MemoryCursor(self[:count])
+
+
+class MemoryCollection:
+    """In-memory stand-in for the subset of pymongo collection used by database_handler, with fixed latency"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.documents = []
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _round_trip(self):
+        """Simulated network latency, then the operation runs alone like on a single mongod"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            yield
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def find(self, query: dict = None, projection: dict = None) -> MemoryCursor:
+        with self._round_trip():
+            return MemoryCursor([_project(document, projection) for document in self.documents
+                                 if _matches(document, query or {})])
+
+    def find_one(self, query: dict = None, projection: dict = None):
+        found = self.find(query, projection)
+
+        return found[0] if found else None
+
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool = False):
+        matched = [document for document in self.documents if _matches(document, query)]
+        upserted_id = None
+
+        if not matched and upsert:
+            self._next_id += 1
+            document = {"_id": self._next_id}
+            document.update({key: value for key, value in query.items() if not isinstance(value, dict)})
+
+            for key, value in update.get("$setOnInsert", {}).items():
+                _set(document, key, value)
+
+            self.documents.append(document)
+            matched, upserted_id = [document], self._next_id
+
+        for document in matched if many else matched[:1]:
+            for key, value in update.get("$set", {}).items():
+                _set(document, key, value)
+
+            for key in update.get("$unset", {}):
+                _unset(document, key)
+
+            for key, value in update.get("$inc", {}).items():
+                _set(document, key, (_get(document, key) or 0) + value)
+
+            for key, value in update.get("$max", {}).items():
+                current = _get(document, key)
+                _set(document, key, value if current is None else max(current, value))
+
+        return SimpleNamespace(acknowledged=True, matched_count=len(matched) - (upserted_id is not None),
+                               modified_count=len(matched), upserted_id=upserted_id)
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False):
+        with self._round_trip():
+            return self._update(query, update, upsert)
+
+    def update_many(self, query: dict, update: dict, upsert: bool = False):
+        with self._round_trip():
+            return self._update(query, update, upsert, many=True)
+
+    def delete_one(self, query: dict):
+        with self._round_trip():
+            for document in self.documents:
+                if _matches(document, query):
+                    self.documents.remove(document)
+                    return SimpleNamespace(acknowledged=True, deleted_count=1)
+
+            return SimpleNamespace(acknowledged=True, deleted_count=0)
+
+    def delete_many(self, query: dict):
+        with self._round_trip():
+            kept = [document for document in self.documents if not _matches(document, query)]
+            deleted_count = len(self.documents) - len(kept)
+            self.documents[:] = kept
+
+            return SimpleNamespace(acknowledged=True, deleted_count=deleted_count)
+
+    def bulk_write(self, operations: list, ordered: bool = True):
+        with self._round_trip():
+            upserted_ids = {}
+
+            for index, operation in enumerate(operations):
+                result = self._update(operation._filter, operation._doc, operation._upsert)
+
+                if result.upserted_id is not None:
+                    upserted_ids[index] = result.upserted_id
+
+            return SimpleNamespace(acknowledged=True, upserted_ids=upserted_ids)
+
+    def distinct(self, key: str, query: dict = None) -> list:
+        with self._round_trip():
+            return list({_get(document, key) for document in self.documents if _matches(document, query or {})})
+
+    def aggregate(self, pipeline: list) -> list:
+        """Only single $group stage with _id made of fields is supported"""
+        with self._round_trip():
+            group_id = pipeline[0]["$group"]["_id"]
+            groups = {tuple((name, _get(document, field[1:])) for name, field in group_id.items())
+                      for document in self.documents}
+
+            return [{"_id": dict(group)} for group in groups]
+
+
+def install(latency: float = 0.0):
+    """Point database_handler to in-memory collections instead of mongodb"""
+    collections = defaultdict(lambda: MemoryCollection(latency))
+
+    db.db_client = SimpleNamespace(close=lambda: None)
+    db.db = collections
+    db.servers_collection = collections[db.COLLECTION_NAME]
+    db.game_servers_collection = collections[db.GAME_SERVERS_COLLECTION_NAME]
+    db._executor = ThreadPoolExecutor(max_workers=db.MONGODB_POOL_SIZE, thread_name_prefix="mongodb")
+    db._legacy_servers = False
+    db.clear_guild_cache()
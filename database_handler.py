@@ -1,9 +1,18 @@
 import os
+import time
+import asyncio
+import logging
+import threading
 import pymongo
-from typing import Union
+import metrics
+import server_names
+from typing import Callable, Iterable, Union
 from dotenv import load_dotenv
-from pymongo import ASCENDING
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 from urllib.parse import quote_plus
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 
 class DatabaseConnectionError(Exception):
@@ -16,62 +25,329 @@ MONGODB_PASSWORD = os.getenv("MONGODB_PASSWORD")
 MONGODB_IP_AND_PORT = os.getenv("MONGODB_IP_AND_PORT")
 MONGODB_STRING = os.getenv("MONGODB_STRING")
 
-# Connect with mongodb string
-if MONGODB_STRING:
-    db_client = pymongo.MongoClient(MONGODB_STRING)
+# Connection pool and timeout for every database operation (seconds)
+MONGODB_POOL_SIZE = int(os.getenv("MONGODB_POOL_SIZE", 16))
+MONGODB_TIMEOUT = float(os.getenv("MONGODB_TIMEOUT", 5))
 
-# Connect if server doesn't have mongodb users with passwords
-elif MONGODB_IP_AND_PORT and not MONGODB_USERNAME and not MONGODB_PASSWORD:
-    db_client = pymongo.MongoClient(f"mongodb://{MONGODB_IP_AND_PORT}/")
+# How many discord servers configs are kept in memory and if they are invalidated by change stream (replica set only)
+GUILD_CACHE_SIZE = int(os.getenv("GUILD_CACHE_SIZE", 10000))
+MONGODB_WATCH_CHANGES = os.getenv("MONGODB_WATCH_CHANGES", "false").lower() == "true"
 
-# Connect with username and password
-elif MONGODB_IP_AND_PORT and MONGODB_USERNAME and MONGODB_PASSWORD:
-    MONGODB_USERNAME = quote_plus(MONGODB_USERNAME)
-    MONGODB_PASSWORD = quote_plus(MONGODB_PASSWORD)
-    db_client = pymongo.MongoClient(f"mongodb://{MONGODB_USERNAME}:{MONGODB_PASSWORD}@{MONGODB_IP_AND_PORT}/")
+DATABASE_NAME = "DiscordBot"
+COLLECTION_NAME = "servers"
+GAME_SERVERS_COLLECTION_NAME = "game_servers"
+LIVE_MESSAGES_COLLECTION_NAME = "live_messages"
+PLAYTIME_SERVERS_COLLECTION_NAME = "playtime_servers"
+PLAYTIME_GUILDS_COLLECTION_NAME = "playtime_guilds"
+ALERTS_COLLECTION_NAME = "alerts"
+
+# Player count history buckets, their size and how long are they kept (seconds)
+HISTORY_RESOLUTIONS = {
+    "1m": {"size": 60, "retention": 2 * 24 * 3600},
+    "15m": {"size": 15 * 60, "retention": 8 * 24 * 3600},
+    "1h": {"size": 3600, "retention": 90 * 24 * 3600},
+}
+
+# Playtime leaderboards of days and weeks are removed this long after last update (seconds)
+PLAYTIME_RETENTION = {
+    "day": 2 * 24 * 3600,
+    "week": 15 * 24 * 3600,
+}
+
+db_client = None
+db = None
+servers_collection = None
+game_servers_collection = None
+_executor = None
+_guild_cache = OrderedDict()
+
+# Running loads of discord servers not in cache, callers asking for the same discord server share one
+_guild_loads = {}
+_watch_stop = threading.Event()
+_watch_task = None
+
+# Game servers could be still stored in nested servers dict of discord server until migrate.py finishes,
+# processes which don't poll game servers check it again after LEGACY_CHECK_INTERVAL seconds
+LEGACY_CHECK_INTERVAL = 300.0
+_legacy_servers = True
+_legacy_checked = 0.0
+
+logger = logging.getLogger(__name__)
+
+
+def connection_string() -> str:
+    """Build mongodb connection string from env"""
+    # Connect with mongodb string
+    if MONGODB_STRING:
+        return MONGODB_STRING
+
+    # Connect if server doesn't have mongodb users with passwords
+    elif MONGODB_IP_AND_PORT and not MONGODB_USERNAME and not MONGODB_PASSWORD:
+        return f"mongodb://{MONGODB_IP_AND_PORT}/"
+
+    # Connect with username and password
+    elif MONGODB_IP_AND_PORT and MONGODB_USERNAME and MONGODB_PASSWORD:
+        username = quote_plus(MONGODB_USERNAME)
+        password = quote_plus(MONGODB_PASSWORD)
+        return f"mongodb://{username}:{password}@{MONGODB_IP_AND_PORT}/"
 
-else:
-    raise DatabaseConnectionError("Missing database username, password, ip or atlas string from env")
+    else:
+        raise DatabaseConnectionError("Missing database username, password, ip or atlas string from env")
 
-db = db_client["DiscordBot"]
-COLLECTION_NAME = "servers"
 
-# Create collection if not exists
-if COLLECTION_NAME not in db.list_collection_names():
-    db.create_collection(COLLECTION_NAME)
+async def connect(mongodb_string: str = None, pool_size: int = MONGODB_POOL_SIZE,
+                  watch: bool = MONGODB_WATCH_CHANGES):
+    """Connect to database, create collection and indexes, with watch changes of other bot processes are followed"""
+    global db_client, db, servers_collection, game_servers_collection, _executor, _watch_task
 
-servers_collection = db[COLLECTION_NAME]
-servers_collection.create_index([("guild_id", ASCENDING), ("name", ASCENDING)], unique=True)
+    db_client = pymongo.MongoClient(mongodb_string or connection_string(), maxPoolSize=pool_size,
+                                    retryReads=True, retryWrites=True)
+    db = db_client[DATABASE_NAME]
+    servers_collection = db[COLLECTION_NAME]
+    game_servers_collection = db[GAME_SERVERS_COLLECTION_NAME]
 
+    # Blocking pymongo calls run on executor with as many workers as there are pooled connections
+    _executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="mongodb")
 
-def create_default_config(guild_id: int) -> bool:
-    """Create default configuration for server in database"""
-    if not find_discord_server(guild_id):
-        default_config = {
-            "guild_id": guild_id,
-            "servers": {}
-        }
+    await _run(_create_collections)
 
-        insert = servers_collection.insert_one(default_config)
+    if watch:
+        _watch_task = asyncio.create_task(watch_changes())
 
-        return insert.acknowledged
 
-    else:
-        return False
+def close():
+    """Close database connection and executor"""
+    global db_client, db, servers_collection, game_servers_collection, _executor
+
+    if db_client is not None:
+        db_client.close()
+        _executor.shutdown(wait=False)
+
+    _watch_stop.set()
+    clear_guild_cache()
+    db_client = db = servers_collection = game_servers_collection = _executor = None
+
+
+def _create_collections():
+    # Create collection if not exists
+    if COLLECTION_NAME not in db.list_collection_names():
+        db.create_collection(COLLECTION_NAME)
+
+    servers_collection.create_index("guild_id", unique=True)
+
+    # Game servers are found by discord server and name, or by endpoint across all discord servers
+    game_servers_collection.create_index([("guild_id", ASCENDING), ("name", ASCENDING)], unique=True)
+    game_servers_collection.create_index([("ip", ASCENDING), ("port", ASCENDING)])
+
+    # One live status message per discord channel
+    db[LIVE_MESSAGES_COLLECTION_NAME].create_index("channel_id", unique=True)
+
+    # History buckets are found by server and time and removed by TTL index after retention
+    for resolution, settings in HISTORY_RESOLUTIONS.items():
+        history_collection = db[f"history_{resolution}"]
+        history_collection.create_index([("ip", ASCENDING), ("port", ASCENDING), ("time", ASCENDING)], unique=True)
+        history_collection.create_index("time", expireAfterSeconds=settings["retention"])
+
+    # One subscription of channel per server and event, subscriptions of discord server are listed together
+    alerts_collection = db[ALERTS_COLLECTION_NAME]
+    alerts_collection.create_index([("channel_id", ASCENDING), ("server_name", ASCENDING), ("event", ASCENDING)],
+                                   unique=True)
+    alerts_collection.create_index([("guild_id", ASCENDING), ("server_name", ASCENDING)])
+
+    # Playtime leaderboards are kept sorted by index, so top players are read without scanning all players
+    playtime_servers_collection = db[PLAYTIME_SERVERS_COLLECTION_NAME]
+    playtime_servers_collection.create_index([("ip", ASCENDING), ("port", ASCENDING), ("period", ASCENDING),
+                                              ("name", ASCENDING)], unique=True)
+    playtime_servers_collection.create_index([("ip", ASCENDING), ("port", ASCENDING), ("period", ASCENDING),
+                                              ("seconds", DESCENDING)])
+    playtime_servers_collection.create_index("expires", expireAfterSeconds=0)
+
+    playtime_guilds_collection = db[PLAYTIME_GUILDS_COLLECTION_NAME]
+    playtime_guilds_collection.create_index([("guild_id", ASCENDING), ("name", ASCENDING), ("period", ASCENDING)],
+                                            unique=True)
+    playtime_guilds_collection.create_index("expires", expireAfterSeconds=0)
+
+
+def _with_timeout(operation: Callable):
+    with pymongo.timeout(MONGODB_TIMEOUT):
+        return operation()
+
+
+async def _run(operation: Callable):
+    """Run blocking database operation on executor with timeout"""
+    if db_client is None:
+        raise DatabaseConnectionError("Database is not connected, call connect() first")
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(_executor, _with_timeout, operation)
+
+
+def _cache_guild(guild_id: int, game_servers: Union[dict, None]):
+    """Store game servers of discord server in cache with their names index and evict least recently used"""
+    _guild_cache[guild_id] = game_servers
+    _guild_cache.move_to_end(guild_id)
+    server_names.index.load(guild_id, game_servers or {})
+
+    while len(_guild_cache) > GUILD_CACHE_SIZE:
+        evicted_guild_id, _ = _guild_cache.popitem(last=False)
+        server_names.index.forget(evicted_guild_id)
+
+
+def _discard_guild_load(guild_id: int):
+    """Running load could have read discord server before it was changed, its result won't be cached"""
+    _guild_loads.pop(guild_id, None)
+
+
+def invalidate_guild(guild_id: int):
+    """Remove discord server from cache, next read goes to database"""
+    _discard_guild_load(guild_id)
+    _guild_cache.pop(guild_id, None)
+    server_names.index.forget(guild_id)
+
+
+def clear_guild_cache():
+    """Remove all discord servers from cache"""
+    _guild_loads.clear()
+    _guild_cache.clear()
+    server_names.index.clear()
+
+
+def _check_legacy_servers():
+    global _legacy_servers, _legacy_checked
+
+    if _legacy_servers and time.monotonic() - _legacy_checked > LEGACY_CHECK_INTERVAL:
+        _legacy_checked = time.monotonic()
+        _legacy_servers = servers_collection.find_one({"servers": {"$exists": True}}, {"_id": 1}) is not None
+
+
+def _find_guild_servers(guild_id: int) -> dict:
+    game_servers = {}
+    _check_legacy_servers()
+
+    # Servers not migrated yet, migrated servers override them
+    if _legacy_servers:
+        discord_server = servers_collection.find_one({"guild_id": guild_id}, {"_id": 0, "servers": 1})
+        game_servers.update((discord_server or {}).get("servers", {}))
 
+    projection = {"_id": 0, "name": 1, "ip": 1, "port": 1, "description": 1}
 
-def find_discord_server(guild_id: int) -> Union[dict, None]:
+    for game_server in game_servers_collection.find({"guild_id": guild_id}, projection):
+        game_servers[game_server.pop("name")] = game_server
+
+    return game_servers
+
+
+# Only database round trips are timed, lookups answered from cache are counted by cache metrics
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def _load_guild_servers(guild_id: int) -> dict:
+    return await _run(lambda: _find_guild_servers(guild_id))
+
+
+async def _guild_servers(guild_id: int) -> dict:
+    """Game servers of discord server from cache or database"""
+    if guild_id in _guild_cache:
+        metrics.CACHE_REQUESTS.inc(cache="guild", result="hit")
+        _guild_cache.move_to_end(guild_id)
+        return _guild_cache[guild_id]
+
+    metrics.CACHE_REQUESTS.inc(cache="guild", result="miss")
+    load = _guild_loads.get(guild_id)
+
+    if load is None:
+        load = asyncio.ensure_future(_load_guild_servers(guild_id))
+        load.add_done_callback(lambda done: _finish_guild_load(guild_id, done))
+        _guild_loads[guild_id] = load
+
+    # Shield the shared load, so one cancelled caller doesn't cancel it for the others
+    return await asyncio.shield(load)
+
+
+def _finish_guild_load(guild_id: int, load: asyncio.Future):
+    """Cache loaded discord server unless it was changed or invalidated while it was loading"""
+    if _guild_loads.get(guild_id) is load:
+        del _guild_loads[guild_id]
+
+        if not load.cancelled() and load.exception() is None:
+            _cache_guild(guild_id, load.result())
+
+    # Mark exception as retrieved, waiters could be already cancelled
+    elif not load.cancelled():
+        load.exception()
+
+
+def _watch_guild_changes(loop: asyncio.AbstractEventLoop):
+    with game_servers_collection.watch(full_document="updateLookup", max_await_time_ms=1000) as stream:
+        while not _watch_stop.is_set():
+            change = stream.try_next()
+
+            if change is None or _watch_stop.is_set():
+                continue
+
+            guild_id = (change.get("fullDocument") or {}).get("guild_id")
+
+            # Delete events don't contain guild id, so the whole cache is dropped
+            if guild_id is None:
+                loop.call_soon_threadsafe(clear_guild_cache)
+
+            else:
+                loop.call_soon_threadsafe(invalidate_guild, guild_id)
+
+
+async def watch_changes():
+    """Invalidate cached discord servers changed by other bot processes"""
+    _watch_stop.clear()
+    loop = asyncio.get_running_loop()
+
+    try:
+        await asyncio.to_thread(_watch_guild_changes, loop)
+
+    except pymongo.errors.PyMongoError:
+        logger.exception("Watching database changes failed, clearing discord servers cache")
+        clear_guild_cache()
+
+    # Thread can't be cancelled, it is stopped within max_await_time_ms also when the task is cancelled on shutdown,
+    # otherwise the event loop would wait for it forever when closing its executor
+    finally:
+        _watch_stop.set()
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def create_default_configs(guild_ids: Iterable[int]) -> list:
+    """Create default configuration for all servers not in database with one bulk write, returns created ids"""
+    guild_ids = list(guild_ids)
+
+    if not guild_ids:
+        return []
+
+    operations = [UpdateOne({"guild_id": guild_id}, {"$setOnInsert": {"guild_id": guild_id}},
+                            upsert=True) for guild_id in guild_ids]
+    result = await _run(lambda: servers_collection.bulk_write(operations, ordered=False))
+    created_ids = [guild_ids[index] for index in result.upserted_ids]
+
+    for guild_id in created_ids:
+        _cache_guild(guild_id, {})
+
+    return created_ids
+
+
+async def create_default_config(guild_id: int) -> bool:
+    """Create default configuration for server in database"""
+    return bool(await create_default_configs([guild_id]))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def find_discord_server(guild_id: int) -> Union[dict, None]:
     """Find discord server in database"""
-    server_exists = servers_collection.find_one({"guild_id": guild_id})
+    server_exists = await _run(lambda: servers_collection.find_one({"guild_id": guild_id}))
 
     return server_exists
 
 
-def find_game_server(guild_id: int, game_server_name: str) -> Union[dict, None]:
+async def find_game_server(guild_id: int, game_server_name: str) -> Union[dict, None]:
     """Find game server in database"""
     try:
-        discord_server = servers_collection.find_one({"guild_id": guild_id}, {"_id": 0})
-        game_server = discord_server["servers"][game_server_name]
+        game_server = (await _guild_servers(guild_id))[game_server_name]
 
         return game_server
 
@@ -79,11 +355,10 @@ def find_game_server(guild_id: int, game_server_name: str) -> Union[dict, None]:
         return None
 
 
-def all_game_servers(guild_id: int) -> Union[list, None]:
+async def all_game_servers(guild_id: int) -> Union[list, None]:
     """List of all game servers in database"""
     try:
-        discord_server = servers_collection.find_one({"guild_id": guild_id}, {"_id": 0})
-        game_servers = list(discord_server["servers"].keys())
+        game_servers = list((await _guild_servers(guild_id)).keys())
 
         return game_servers
 
@@ -91,7 +366,44 @@ def all_game_servers(guild_id: int) -> Union[list, None]:
         return None
 
 
-def add_game_server(guild_id: int, server_name: str, ip: str, port: int, description: str) -> bool:
+def _find_game_server_endpoints() -> set:
+    global _legacy_servers
+
+    endpoints = set()
+    pipeline = [{"$group": {"_id": {"ip": "$ip", "port": "$port"}}}]
+
+    for endpoint in game_servers_collection.aggregate(pipeline):
+        endpoints.add((endpoint["_id"]["ip"], endpoint["_id"]["port"]))
+
+    if _legacy_servers:
+        legacy_discord_servers = list(servers_collection.find({"servers": {"$exists": True}}, {"_id": 0, "servers": 1}))
+
+        for discord_server in legacy_discord_servers:
+            for game_server in discord_server["servers"].values():
+                endpoints.add((game_server["ip"], game_server["port"]))
+
+        # Nothing left to migrate, stop reading nested servers
+        _legacy_servers = bool(legacy_discord_servers)
+
+    return endpoints
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def all_game_server_endpoints() -> set:
+    """Set of unique (ip, port) of game servers across all discord servers"""
+    return await _run(_find_game_server_endpoints)
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def guilds_tracking_endpoint(ip: str, port: int) -> list:
+    """Ids of discord servers which added game server with this ip and port"""
+    query = {"ip": ip, "port": port}
+
+    return await _run(lambda: game_servers_collection.distinct("guild_id", query))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def add_game_server(guild_id: int, server_name: str, ip: str, port: int, description: str) -> bool:
     """Add game server to the database"""
     new_server = {
         "ip": ip,
@@ -99,23 +411,214 @@ def add_game_server(guild_id: int, server_name: str, ip: str, port: int, descrip
         "description": description
     }
 
-    query = {"guild_id": guild_id}
-    update = {"$set": {f"servers.{server_name}": new_server}}
-    result = servers_collection.update_one(query, update)
+    query = {"guild_id": guild_id, "name": server_name}
+    update = {"$set": new_server}
+    result = await _run(lambda: game_servers_collection.update_one(query, update, upsert=True))
+    _discard_guild_load(guild_id)
+
+    if guild_id in _guild_cache:
+        _guild_cache[guild_id][server_name] = new_server
+        server_names.index.add(guild_id, server_name)
 
     return result.acknowledged
 
 
-def del_game_server(guild_id: int, server_name: str) -> bool:
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def del_game_server(guild_id: int, server_name: str) -> bool:
     """Delete game server from database"""
-    server_exists = find_game_server(guild_id, server_name)
+    query = {"guild_id": guild_id, "name": server_name}
+    result = await _run(lambda: game_servers_collection.delete_one(query))
+    deleted = result.deleted_count > 0
 
-    if server_exists:
-        query = {"guild_id": guild_id}
-        update = {"$unset": {f"servers.{server_name}": 1}}
-        result = servers_collection.update_one(query, update)
+    # Alerts of deleted server
+    alerts_query = {"guild_id": guild_id, "server_name": server_name}
+    await _run(lambda: db[ALERTS_COLLECTION_NAME].delete_many(alerts_query))
 
-        return result.acknowledged
+    if _legacy_servers:
+        legacy_update = {"$unset": {f"servers.{server_name}": 1}}
+        legacy_result = await _run(lambda: servers_collection.update_one({"guild_id": guild_id}, legacy_update))
+        deleted = deleted or legacy_result.modified_count > 0
 
-    else:
-        return False
+    _discard_guild_load(guild_id)
+
+    if guild_id in _guild_cache:
+        _guild_cache[guild_id].pop(server_name, None)
+        server_names.index.remove(guild_id, server_name)
+
+    return deleted
+
+
+def _bucket_start(time: datetime, size: int) -> datetime:
+    """Start of bucket with size in seconds containing naive utc time"""
+    seconds = int((time - datetime(1970, 1, 1)).total_seconds())
+
+    return datetime.utcfromtimestamp(seconds // size * size)
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def save_history(buckets: Iterable[dict]) -> bool:
+    """Add one minute player count buckets to history and roll them up into coarser buckets"""
+    operations = {resolution: [] for resolution in HISTORY_RESOLUTIONS}
+
+    for bucket in buckets:
+        for resolution, settings in HISTORY_RESOLUTIONS.items():
+            bucket_start = _bucket_start(bucket["time"], settings["size"])
+            query = {"ip": bucket["ip"], "port": bucket["port"], "time": bucket_start}
+            update = {"$inc": {"samples": bucket["samples"], "players_sum": bucket["players_sum"]},
+                      "$max": {"players_max": bucket["players_max"], "max_players": bucket["max_players"]},
+                      "$set": {"map": bucket["map"]}}
+
+            operations[resolution].append(UpdateOne(query, update, upsert=True))
+
+    def write_buckets():
+        for resolution, resolution_operations in operations.items():
+            if resolution_operations:
+                db[f"history_{resolution}"].bulk_write(resolution_operations, ordered=False)
+
+    await _run(write_buckets)
+
+    return True
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def find_history(ip: str, port: int, resolution: str, since: datetime) -> list:
+    """History buckets of game server since time, sorted from oldest"""
+    query = {"ip": ip, "port": port, "time": {"$gte": since}}
+    projection = {"_id": 0, "time": 1, "samples": 1, "players_sum": 1, "players_max": 1, "max_players": 1}
+
+    return await _run(lambda: list(db[f"history_{resolution}"].find(query, projection).sort("time", ASCENDING)))
+
+
+def _playtime_periods(time: datetime) -> dict:
+    """Keys of day, week and all time leaderboards containing naive utc time"""
+    year, week, _ = time.isocalendar()
+
+    return {"day": f"day:{time:%Y-%m-%d}", "week": f"week:{year}-W{week:02d}", "all": "all"}
+
+
+def _playtime_update(playtime: dict, period: str, now: datetime) -> dict:
+    update = {"$inc": {"seconds": playtime["seconds"], "sessions": playtime["sessions"]},
+              "$max": {"last_seen": playtime["last_seen"]}}
+
+    if period in PLAYTIME_RETENTION:
+        update["$max"]["expires"] = now + timedelta(seconds=PLAYTIME_RETENTION[period])
+
+    return update
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def save_playtime(players_playtime: Iterable[dict]) -> bool:
+    """Add playtime and sessions of players to leaderboards of game server and discord servers tracking it"""
+    now = datetime.utcnow()
+    periods = _playtime_periods(now)
+    server_operations = []
+    guild_operations = []
+
+    for playtime in players_playtime:
+        for period, period_key in periods.items():
+            query = {"ip": playtime["ip"], "port": playtime["port"], "period": period_key, "name": playtime["name"]}
+            server_operations.append(UpdateOne(query, _playtime_update(playtime, period, now), upsert=True))
+
+            for guild_id in playtime["guild_ids"]:
+                query = {"guild_id": guild_id, "name": playtime["name"], "period": period_key}
+                guild_operations.append(UpdateOne(query, _playtime_update(playtime, period, now), upsert=True))
+
+    def write_playtime():
+        if server_operations:
+            db[PLAYTIME_SERVERS_COLLECTION_NAME].bulk_write(server_operations, ordered=False)
+
+        if guild_operations:
+            db[PLAYTIME_GUILDS_COLLECTION_NAME].bulk_write(guild_operations, ordered=False)
+
+    await _run(write_playtime)
+
+    return True
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def find_top_players(ip: str, port: int, period: str, limit: int) -> list:
+    """Players with the longest playtime on game server in the current day, week or all time"""
+    query = {"ip": ip, "port": port, "period": _playtime_periods(datetime.utcnow())[period]}
+    projection = {"_id": 0, "name": 1, "seconds": 1, "sessions": 1}
+
+    return await _run(lambda: list(db[PLAYTIME_SERVERS_COLLECTION_NAME].find(query, projection)
+                                   .sort("seconds", DESCENDING).limit(limit)))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def find_player_playtime(guild_id: int, name: str) -> dict:
+    """Playtime of player on game servers of discord server in the current day, week and all time"""
+    period_keys = {period_key: period for period, period_key in _playtime_periods(datetime.utcnow()).items()}
+    query = {"guild_id": guild_id, "name": name, "period": {"$in": list(period_keys)}}
+    projection = {"_id": 0, "period": 1, "seconds": 1, "sessions": 1, "last_seen": 1}
+    documents = await _run(lambda: list(db[PLAYTIME_GUILDS_COLLECTION_NAME].find(query, projection)))
+
+    return {period_keys[document.pop("period")]: document for document in documents}
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def set_live_message(guild_id: int, channel_id: int, message_id: int, server_name: str) -> Union[dict, None]:
+    """Save live status message of channel and return the previous one"""
+    query = {"channel_id": channel_id}
+    live_message = {"guild_id": guild_id, "channel_id": channel_id, "message_id": message_id,
+                    "server_name": server_name}
+
+    return await _run(lambda: db[LIVE_MESSAGES_COLLECTION_NAME].find_one_and_replace(query, live_message, {"_id": 0},
+                                                                                      upsert=True))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def del_live_message(channel_id: int) -> Union[dict, None]:
+    """Delete live status message of channel and return it"""
+    query = {"channel_id": channel_id}
+
+    return await _run(lambda: db[LIVE_MESSAGES_COLLECTION_NAME].find_one_and_delete(query, {"_id": 0}))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def all_live_messages() -> list:
+    """List of all live status messages"""
+    return await _run(lambda: list(db[LIVE_MESSAGES_COLLECTION_NAME].find({}, {"_id": 0})))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def add_alert(guild_id: int, channel_id: int, server_name: str, ip: str, port: int, event: str,
+                    threshold: int = None) -> dict:
+    """Subscribe channel to event of game server, it replaces the same subscription with other threshold"""
+    query = {"channel_id": channel_id, "server_name": server_name, "event": event}
+    alert = {"guild_id": guild_id, "channel_id": channel_id, "server_name": server_name, "ip": ip, "port": port,
+             "event": event, "threshold": threshold}
+
+    await _run(lambda: db[ALERTS_COLLECTION_NAME].replace_one(query, alert, upsert=True))
+    alert.pop("_id", None)
+
+    return alert
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def del_alert(channel_id: int, server_name: str, event: str) -> Union[dict, None]:
+    """Delete subscription of channel and return it"""
+    query = {"channel_id": channel_id, "server_name": server_name, "event": event}
+
+    return await _run(lambda: db[ALERTS_COLLECTION_NAME].find_one_and_delete(query, {"_id": 0}))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def del_channel_alerts(channel_id: int) -> int:
+    """Delete all subscriptions of channel"""
+    result = await _run(lambda: db[ALERTS_COLLECTION_NAME].delete_many({"channel_id": channel_id}))
+
+    return result.deleted_count
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def guild_alerts(guild_id: int) -> list:
+    """Subscriptions of all channels of discord server"""
+    return await _run(lambda: list(db[ALERTS_COLLECTION_NAME].find({"guild_id": guild_id}, {"_id": 0})
+                                   .sort("server_name", ASCENDING)))
+
+
+@metrics.timed(metrics.DATABASE_SECONDS, metrics.DATABASE_ERRORS)
+async def all_alerts() -> list:
+    """List of all subscriptions"""
+    return await _run(lambda: list(db[ALERTS_COLLECTION_NAME].find({}, {"_id": 0})))
@@ -0,0 +1,225 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+import metrics
+from typing import Awaitable, Callable, List, Tuple
+
+# aiodns is optional, without it names are resolved by getaddrinfo which doesn't tell TTL of the record
+try:
+    import aiodns
+
+except ImportError:
+    aiodns = None
+
+# TTL of records is kept between MIN_TTL and MAX_TTL, DEFAULT_TTL is used when backend doesn't know it (seconds)
+DEFAULT_TTL = 300.0
+MIN_TTL = 30.0
+MAX_TTL = 3600.0
+
+# Names which don't exist are remembered for NEGATIVE_TTL, records used since their last lookup are refreshed
+# in background when the last REFRESH_BEFORE_EXPIRY share of their TTL is left, unused ones expire
+NEGATIVE_TTL = 60.0
+REFRESH_BEFORE_EXPIRY = 0.2
+MAX_ENTRIES = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class NameNotFoundError(socket.gaierror):
+    """Domain name doesn't exist or it has no ipv4 address"""
+
+    def __init__(self, host: str):
+        super().__init__(socket.EAI_NONAME, f"Name {host} doesn't exist")
+
+
+async def getaddrinfo_backend(host: str) -> Tuple[List[str], float]:
+    """Resolve name with system resolver in executor"""
+    try:
+        address_info = await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET,
+                                                                      type=socket.SOCK_DGRAM)
+
+    except socket.gaierror as error:
+        if error.errno in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)):
+            raise NameNotFoundError(host) from error
+
+        raise
+
+    return [info[4][0] for info in address_info], DEFAULT_TTL
+
+
+def aiodns_backend() -> Callable[[str], Awaitable[Tuple[List[str], float]]]:
+    """Resolve A records with aiodns, they come with TTL"""
+    dns_resolver = aiodns.DNSResolver()
+
+    async def resolve(host: str) -> Tuple[List[str], float]:
+        try:
+            records = await dns_resolver.query(host, "A")
+
+        except aiodns.error.DNSError as error:
+            if error.args and error.args[0] in (aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA):
+                raise NameNotFoundError(host) from error
+
+            raise OSError(*error.args) from error
+
+        return [record.host for record in records], min([record.ttl for record in records], default=DEFAULT_TTL)
+
+    return resolve
+
+
+class DNSCache:
+    """Caches resolved names by their TTL, answers without waiting while records are refreshed in background"""
+
+    def __init__(self, backend: Callable[[str], Awaitable[Tuple[List[str], float]]] = None):
+        self._backend = backend
+        self._entries = {}
+        self._lookups = {}
+        self._refreshes = set()
+        self._refresh_timers = {}
+        self._used = set()
+
+    @property
+    def backend(self) -> Callable[[str], Awaitable[Tuple[List[str], float]]]:
+        """Coroutine function host -> (addresses, ttl), raises NameNotFoundError or OSError when lookup failed"""
+        if self._backend is None:
+            self._backend = aiodns_backend() if aiodns else getaddrinfo_backend
+
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: Callable[[str], Awaitable[Tuple[List[str], float]]]):
+        self._backend = backend
+        self._entries.clear()
+        self._used.clear()
+
+        for timer in self._refresh_timers.values():
+            timer.cancel()
+
+        self._refresh_timers.clear()
+
+    async def _lookup(self, host: str) -> List[str]:
+        now = time.monotonic()
+
+        try:
+            addresses, ttl = await self.backend(host)
+
+        except NameNotFoundError:
+            self._store(host, None, NEGATIVE_TTL, now)
+            raise
+
+        # Resolver is unavailable, stale addresses are better than none
+        except OSError:
+            entry = self._entries.get(host)
+
+            if entry and entry[0]:
+                logger.warning("Resolving %s failed, using expired addresses", host)
+                return entry[0]
+
+            raise
+
+        if not addresses:
+            self._store(host, None, NEGATIVE_TTL, now)
+            raise NameNotFoundError(host)
+
+        self._store(host, addresses, min(max(ttl, MIN_TTL), MAX_TTL), now)
+
+        return addresses
+
+    def _store(self, host: str, addresses: List[str], ttl: float, now: float):
+        self._forget_entry(host)
+        refresh_after = ttl * (1 - REFRESH_BEFORE_EXPIRY)
+        self._entries[host] = (addresses, now + ttl, now + refresh_after)
+
+        if addresses is not None:
+            loop = asyncio.get_running_loop()
+            self._refresh_timers[host] = loop.call_later(refresh_after, self._scheduled_refresh, host)
+
+        # Drop expired entries, then the oldest ones
+        if len(self._entries) > MAX_ENTRIES:
+            for expired_host in [name for name, entry in self._entries.items() if entry[1] <= now]:
+                self._forget_entry(expired_host)
+
+            while len(self._entries) > MAX_ENTRIES:
+                self._forget_entry(next(iter(self._entries)))
+
+    def _forget_entry(self, host: str):
+        self._entries.pop(host, None)
+        self._used.discard(host)
+        timer = self._refresh_timers.pop(host, None)
+
+        if timer is not None:
+            timer.cancel()
+
+    def _scheduled_refresh(self, host: str):
+        """Refresh record before it expires, names nobody asked for since their lookup are left to expire"""
+        self._refresh_timers.pop(host, None)
+
+        if host in self._used:
+            self._used.discard(host)
+            self._refresh(host)
+
+    def _forget_lookup(self, host: str, future: asyncio.Future):
+        if self._lookups.get(host) is future:
+            del self._lookups[host]
+
+        if not future.cancelled():
+            future.exception()
+
+    def _coalesced_lookup(self, host: str) -> asyncio.Future:
+        """One lookup of name at a time, every caller waits for the same one"""
+        future = self._lookups.get(host)
+
+        if future is None:
+            future = asyncio.ensure_future(self._lookup(host))
+            future.add_done_callback(lambda done: self._forget_lookup(host, done))
+            self._lookups[host] = future
+
+        return future
+
+    def _refresh(self, host: str):
+        if host not in self._lookups:
+            task = self._coalesced_lookup(host)
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+
+    async def resolve(self, host: str) -> str:
+        """Ipv4 address of host, ip addresses are returned as they are"""
+        try:
+            ipaddress.IPv4Address(host)
+            return host
+
+        except ValueError:
+            pass
+
+        entry = self._entries.get(host)
+        now = time.monotonic()
+
+        if entry is not None and now < entry[1]:
+            metrics.CACHE_REQUESTS.inc(cache="dns", result="hit")
+            addresses, _, refresh_at = entry
+
+            if addresses is None:
+                raise NameNotFoundError(host)
+
+            # Scheduled refresh already passed without the name being used, so it is refreshed now
+            if now >= refresh_at and host not in self._refresh_timers:
+                self._refresh(host)
+
+            else:
+                self._used.add(host)
+
+            return addresses[0]
+
+        metrics.CACHE_REQUESTS.inc(cache="dns", result="miss")
+        addresses = await asyncio.shield(self._coalesced_lookup(host))
+
+        return addresses[0]
+
+    async def resolve_address(self, address: Tuple[str, int]) -> Tuple[str, int]:
+        host, port = address
+
+        return await self.resolve(host), port
+
+
+resolver = DNSCache()
@@ -1,7 +1,19 @@
+import io
 import discord
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Union
 
+# Discord field can have at most 1024 characters, so long player lists are split into pages
+PLAYERS_PER_PAGE = 15
+PLAYER_NAME_MAX_LENGTH = 32
+
+# Player list can be sorted by these keys, the bool says if it is descending
+PLAYER_SORT_KEYS = {
+    "score": (lambda player: player.score, True),
+    "playtime": (lambda player: player.duration, True),
+    "name": (lambda player: player.name.casefold(), False),
+}
+
 
 def send_help_embed(ctx, bot_prefix: str):
     embed = discord.Embed(title="Help message",
@@ -12,9 +24,13 @@ def send_help_embed(ctx, bot_prefix: str):
                           color=discord.Color.blurple())
 
     embed.add_field(name=":gear: Manage Games Server", inline=False,
-                    value=f"`{bot_prefix}servers`, `{bot_prefix}add_server`, `{bot_prefix}del_server`")
+                    value=f"`{bot_prefix}servers`, `{bot_prefix}add_server`, `{bot_prefix}del_server`, "
+                          f"`{bot_prefix}live`, `{bot_prefix}unlive`, `{bot_prefix}alert`, `{bot_prefix}unalert`")
     embed.add_field(name=":page_facing_up: Get information", value=f"`{bot_prefix}stats`, `{bot_prefix}info`, "
-                                                                   f"`{bot_prefix}players`", inline=False)
+                                                                   f"`{bot_prefix}players`, `{bot_prefix}history`, "
+                                                                   f"`{bot_prefix}status`, `{bot_prefix}top`, "
+                                                                   f"`{bot_prefix}player`, `{bot_prefix}alerts`",
+                    inline=False)
 
     return ctx.send(embed=embed)
 
@@ -33,8 +49,8 @@ def send_embed(ctx, title: str, description: str = None, color: Union[int, disco
     return ctx.send(embed=embed)
 
 
-def send_stats_embed(ctx, ip: str, description: str, game: str, server_name: str, game_map: str, players: str,
-                     map_thumbnail: str, color: Union[int, discord.Colour, None] = 0x0391fb):
+def build_stats_embed(ip: str, description: str, game: str, server_name: str, game_map: str, players: str,
+                      color: Union[int, discord.Colour, None] = 0x0391fb) -> discord.Embed:
 
     embed = discord.Embed(title=":bar_chart: Server Stats", description=description, color=color)
     embed.add_field(name=":video_game: Game", value=game, inline=False)
@@ -44,17 +60,52 @@ def send_stats_embed(ctx, ip: str, description: str, game: str, server_name: str
     embed.add_field(name=":trophy: Players", value=players, inline=False)
     embed.timestamp = datetime.utcnow()
 
-    if map_thumbnail:
-        thumbnail_file = discord.File(map_thumbnail)
+    return embed
+
+
+async def send_stats_embed(ctx, ip: str, description: str, game: str, server_name: str, game_map: str, players: str,
+                           map_thumbnail=None, color: Union[int, discord.Colour, None] = 0x0391fb):
+
+    embed = build_stats_embed(ip=ip, description=description, game=game, server_name=server_name,
+                              game_map=game_map, players=players, color=color)
+
+    if map_thumbnail and map_thumbnail.valid_cdn_url():
+        embed.set_image(url=map_thumbnail.valid_cdn_url())
+
+        return await ctx.send(embed=embed)
+
+    # Upload thumbnail only once and reuse its discord url in next messages
+    elif map_thumbnail:
+        thumbnail_file = discord.File(io.BytesIO(map_thumbnail.data), filename=map_thumbnail.filename)
         embed.set_image(url=f"attachment://{thumbnail_file.filename}")
+        message = await ctx.send(embed=embed, file=thumbnail_file)
 
-        return ctx.send(embed=embed, file=thumbnail_file)
+        if message.embeds and message.embeds[0].image.url:
+            map_thumbnail.set_cdn_url(message.embeds[0].image.url)
+
+        return message
 
     else:
-        return ctx.send(embed=embed)
+        return await ctx.send(embed=embed)
+
+
+def sort_players(players: list, sort: str = "score") -> list:
+    """Players with name sorted by score, playtime or name"""
+    key, descending = PLAYER_SORT_KEYS[sort]
+
+    return sorted([player for player in players if player.name], key=key, reverse=descending)
 
 
-def send_players_list_embed(ctx, player_names, player_scores, player_playtime):
+def players_columns(players: list) -> tuple:
+    """Names, scores and playtime of players, each joined into one column"""
+    player_names = "\n".join([player.name[:PLAYER_NAME_MAX_LENGTH] for player in players])
+    player_scores = "\n".join([str(player.score) for player in players])
+    player_playtime = "\n".join([f"{int(player.duration // 60)} min" for player in players])
+
+    return player_names, player_scores, player_playtime
+
+
+def build_players_list_embed(player_names, player_scores, player_playtime, footer: str = None) -> discord.Embed:
     embed = discord.Embed(title=":joystick: Player List",
                           description="This is a list of players with their scores and uptimes",
                           color=discord.Color.blue())
@@ -63,6 +114,124 @@ def send_players_list_embed(ctx, player_names, player_scores, player_playtime):
     embed.add_field(name="Score", value=player_scores, inline=True)
     embed.add_field(name="Play Time", value=player_playtime, inline=True)
 
+    if footer:
+        embed.set_footer(text=footer)
+
+    return embed
+
+
+def send_history_embed(ctx, server_name: str, period: str, chart: str, peak: int, average: float, max_players: int,
+                       chart_image: bytes = None):
+    description = f"Player count of **{server_name}** for the last {period}"
+
+    # Text chart is used only when the image couldn't be rendered
+    if not chart_image:
+        description += f"\n```{chart}```"
+
+    embed = discord.Embed(title=":chart_with_upwards_trend: Player History", description=description,
+                          color=discord.Color.blue())
+
+    embed.add_field(name=":trophy: Peak", value=f"{peak}/{max_players}", inline=True)
+    embed.add_field(name=":busts_in_silhouette: Average", value=f"{average:.1f}", inline=True)
+    embed.timestamp = datetime.utcnow()
+
+    if chart_image:
+        chart_file = discord.File(io.BytesIO(chart_image), filename="history.png")
+        embed.set_image(url=f"attachment://{chart_file.filename}")
+
+        return ctx.send(embed=embed, file=chart_file)
+
+    return ctx.send(embed=embed)
+
+
+def format_playtime(seconds: float) -> str:
+    hours, minutes = divmod(int(seconds // 60), 60)
+
+    return f"{hours} h {minutes} min" if hours else f"{minutes} min"
+
+
+def send_top_players_embed(ctx, server_name: str, period: str, top_players: list):
+    lines = [f"**{position}.** {player['name']} - {format_playtime(player['seconds'])}"
+             for position, player in enumerate(top_players, start=1)]
+    title = {"day": "today", "week": "this week", "all": "all time"}[period]
+    embed = discord.Embed(title=f":trophy: Top Players {title}",
+                          description=f"Longest playtime on **{server_name}**\n" + "\n".join(lines),
+                          color=discord.Color.gold())
+    embed.timestamp = datetime.utcnow()
+
+    return ctx.send(embed=embed)
+
+
+def send_player_embed(ctx, player_name: str, playtime: dict):
+    embed = discord.Embed(title=f":bust_in_silhouette: {player_name}",
+                          description="Playtime on game servers of this discord server",
+                          color=discord.Color.blue())
+
+    for period, name in (("day", "Today"), ("week", "This week"), ("all", "All time")):
+        period_playtime = playtime.get(period, {"seconds": 0, "sessions": 0})
+        embed.add_field(name=name, value=f"{format_playtime(period_playtime['seconds'])}\n"
+                                         f"{period_playtime['sessions']} sessions", inline=True)
+
+    last_seen = max([period_playtime["last_seen"] for period_playtime in playtime.values()])
+    embed.add_field(name=":eyes: Last seen", value=f"<t:{int(last_seen.replace(tzinfo=timezone.utc).timestamp())}:R>",
+                    inline=False)
+
+    return ctx.send(embed=embed)
+
+
+def send_alerts_embed(ctx, alerts: list):
+    lines = []
+
+    for alert in alerts:
+        threshold = f" {alert['threshold']}" if alert.get("threshold") is not None else ""
+        lines.append(f"<#{alert['channel_id']}> **{alert['server_name']}** `{alert['event']}{threshold}`")
+
+    embed = discord.Embed(title=":bell: Alerts", description="\n".join(lines), color=discord.Color.orange())
+
+    return ctx.send(embed=embed)
+
+
+async def send_status_embeds(ctx, server_statuses: list, servers_per_page: int = 20):
+    pages = [server_statuses[i:i + servers_per_page] for i in range(0, len(server_statuses), servers_per_page)]
+
+    for page_number, page in enumerate(pages, start=1):
+        lines = []
+
+        for server in page:
+            if server["state"] == "online":
+                lines.append(f":green_circle: **{server['name']}** `{server['map']}` {server['players']}")
+
+            elif server["state"] == "timeout":
+                lines.append(f":yellow_circle: **{server['name']}** timed out")
+
+            else:
+                lines.append(f":red_circle: **{server['name']}** offline")
+
+        title = ":satellite: Servers Status"
+
+        if len(pages) > 1:
+            title += f" ({page_number}/{len(pages)})"
+
+        embed = discord.Embed(title=title, description="\n".join(lines), color=0x0391fb)
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+
+def send_offline_embed(ctx, failing_since: float = None, last_seen: float = None, last_info=None):
+    embed = discord.Embed(title="Server is offline", color=discord.Color.red())
+
+    if failing_since:
+        embed.description = f"The server doesn't respond since <t:{int(failing_since)}:R>"
+
+    if last_seen:
+        embed.add_field(name=":eyes: Last seen", value=f"<t:{int(last_seen)}:f>", inline=False)
+
+    if last_info:
+        embed.add_field(name=":map: Map", value=last_info.map_name, inline=True)
+        embed.add_field(name=":trophy: Players", value=f"{last_info.player_count}/{last_info.max_players}",
+                        inline=True)
+
     return ctx.send(embed=embed)
 
 
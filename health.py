@@ -0,0 +1,87 @@
+import time
+from typing import Tuple, Union
+
+# After FAILURE_THRESHOLD failed queries in a row the server is considered offline and it is only probed
+# with exponential backoff between PROBE_BACKOFF and PROBE_BACKOFF_MAX seconds until it answers again
+FAILURE_THRESHOLD = 3
+PROBE_BACKOFF = 30.0
+PROBE_BACKOFF_MAX = 15 * 60.0
+
+
+class ServerOfflineError(TimeoutError):
+    """Server is known to be offline, it wasn't queried"""
+
+    def __init__(self, health: "EndpointHealth"):
+        super().__init__("Server is offline")
+        self.health = health
+
+
+class EndpointHealth:
+    """Failures in a row and last data of one game server"""
+
+    def __init__(self):
+        self.failures = 0
+        self.failing_since = None
+        self.last_seen = None
+        self.last_info = None
+        self.backoff = 0.0
+        self.next_probe = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        """Circuit is open when server failed too many times, queries are not sent until next probe"""
+        return self.failures >= FAILURE_THRESHOLD
+
+
+class HealthTracker:
+    """Circuit breaker for every game server endpoint"""
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def get(self, address: Tuple[str, int]) -> Union[EndpointHealth, None]:
+        return self.endpoints.get(address)
+
+    def record_success(self, address: Tuple[str, int], info=None):
+        health = self.endpoints.setdefault(address, EndpointHealth())
+        health.failures = 0
+        health.failing_since = None
+        health.backoff = 0.0
+        health.next_probe = 0.0
+        health.last_seen = time.time()
+
+        if info is not None:
+            health.last_info = info
+
+    def record_failure(self, address: Tuple[str, int]):
+        health = self.endpoints.setdefault(address, EndpointHealth())
+        health.failures += 1
+
+        if health.failing_since is None:
+            health.failing_since = time.time()
+
+        if health.is_open:
+            health.backoff = min(PROBE_BACKOFF_MAX, health.backoff * 2 if health.backoff else PROBE_BACKOFF)
+            health.next_probe = time.monotonic() + health.backoff
+
+    def should_query(self, address: Tuple[str, int]) -> bool:
+        """Whether background poller should query server, False while circuit is open until next probe"""
+        health = self.endpoints.get(address)
+
+        return health is None or not health.is_open or time.monotonic() >= health.next_probe
+
+    def check(self, address: Tuple[str, int]):
+        """Raise ServerOfflineError instead of waiting for timeout of server known to be offline,
+        only background probes find out when it is back"""
+        health = self.endpoints.get(address)
+
+        if health is not None and health.is_open:
+            raise ServerOfflineError(health)
+
+    def retain(self, endpoints: set):
+        """Forget endpoints which are no longer registered"""
+        for address in [address for address in self.endpoints if address not in endpoints]:
+            del self.endpoints[address]
+
+
+tracker = HealthTracker()
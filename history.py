@@ -0,0 +1,194 @@
+import io
+import asyncio
+import logging
+import database_handler as db
+from datetime import datetime, timedelta
+from typing import Tuple, Union
+
+# Chart is rendered as image with Pillow, without it installed it is sent as text
+try:
+    from PIL import Image, ImageDraw
+
+except ImportError:
+    Image = ImageDraw = None
+
+# How often are buffered samples written to database (seconds)
+FLUSH_INTERVAL = 60.0
+
+# Period of the history command, how long it is and from which buckets it is rendered
+HISTORY_PERIODS = {
+    "24h": (timedelta(hours=24), "15m"),
+    "7d": (timedelta(days=7), "1h"),
+    "30d": (timedelta(days=30), "1h"),
+}
+DEFAULT_HISTORY_PERIOD = "24h"
+CHART_WIDTH = 48
+CHART_BLOCKS = " ▁▂▃▄▅▆▇█"
+
+# Chart image size, margins around plot area and colors matching discord dark theme
+CHART_IMAGE_SIZE = (640, 240)
+CHART_IMAGE_COLUMNS = 180
+CHART_MARGIN = (40, 12, 12, 24)
+CHART_BACKGROUND = (43, 45, 49)
+CHART_GRID = (78, 80, 88)
+CHART_TEXT = (181, 186, 193)
+CHART_LINE = (88, 101, 242)
+CHART_FILL = (88, 101, 242, 90)
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryRecorder:
+    """Buffers polled player counts into one minute buckets and writes them to database in batches"""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._buckets = {}
+        self._task = None
+
+    async def record(self, address: Tuple[str, int], info, players):
+        """Poller listener adding server info to the current minute bucket"""
+        if info is None:
+            return
+
+        now = datetime.utcnow()
+        minute = now.replace(second=0, microsecond=0)
+        key = (address, minute)
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            bucket = {"ip": address[0], "port": address[1], "time": minute, "samples": 0, "players_sum": 0,
+                      "players_max": 0, "max_players": 0, "map": info.map_name}
+            self._buckets[key] = bucket
+
+        bucket["samples"] += 1
+        bucket["players_sum"] += info.player_count
+        bucket["players_max"] = max(bucket["players_max"], info.player_count)
+        bucket["max_players"] = max(bucket["max_players"], info.max_players)
+        bucket["map"] = info.map_name
+
+    async def flush(self):
+        """Write all buffered buckets with one bulk write per resolution"""
+        if not self._buckets:
+            return
+
+        buckets, self._buckets = self._buckets, {}
+
+        try:
+            await db.save_history(buckets.values())
+
+        except Exception:
+            logger.exception("Saving %d history buckets failed", len(buckets))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+
+recorder = HistoryRecorder()
+
+
+def chart_columns(buckets: list, since: datetime, period: timedelta, width: int) -> list:
+    """Highest average player count of buckets in each of width columns, None where there is no bucket"""
+    columns = [None] * width
+
+    for bucket in buckets:
+        column = min(width - 1, int((bucket["time"] - since) / period * width))
+        average = bucket["players_sum"] / bucket["samples"]
+
+        if columns[column] is None or average > columns[column]:
+            columns[column] = average
+
+    return columns
+
+
+def render_chart(buckets: list, since: datetime, period: timedelta, width: int = CHART_WIDTH) -> str:
+    """Render average player count of buckets as one line chart with width columns"""
+    columns = chart_columns(buckets, since, period, width)
+    peak = max([value for value in columns if value is not None], default=0)
+    chart = ""
+
+    for value in columns:
+        if value is None:
+            chart += " "
+
+        else:
+            level = round(value / peak * (len(CHART_BLOCKS) - 1)) if peak else 0
+            chart += CHART_BLOCKS[max(level, 1)]
+
+    return chart
+
+
+def render_chart_image(buckets: list, since: datetime, period_name: str, max_players: int) -> bytes:
+    """Render average player count of buckets as PNG area chart scaled to max players, gaps are periods without data"""
+    period, resolution = HISTORY_PERIODS[period_name]
+
+    # One column per bucket, so the chart has no gaps between buckets, long periods merge more buckets in column
+    bucket_count = int(period.total_seconds() // db.HISTORY_RESOLUTIONS[resolution]["size"])
+    columns = chart_columns(buckets, since, period, min(bucket_count, CHART_IMAGE_COLUMNS))
+    top = max([max_players] + [value for value in columns if value is not None]) or 1
+
+    image = Image.new("RGB", CHART_IMAGE_SIZE, CHART_BACKGROUND)
+    draw = ImageDraw.Draw(image, "RGBA")
+    left, top_margin, right, bottom = CHART_MARGIN
+    plot_width = CHART_IMAGE_SIZE[0] - left - right
+    plot_height = CHART_IMAGE_SIZE[1] - top_margin - bottom
+    base = top_margin + plot_height
+
+    # Grid lines at zero, half and full server
+    for fraction in (0, 0.5, 1):
+        y = base - fraction * plot_height
+        draw.line([(left, y), (left + plot_width, y)], fill=CHART_GRID)
+        draw.text((4, y - 6), str(round(top * fraction)), fill=CHART_TEXT)
+
+    draw.text((left, base + 6), f"-{period_name}", fill=CHART_TEXT)
+    draw.text((left + plot_width - 18, base + 6), "now", fill=CHART_TEXT)
+
+    # Every run of columns with data is drawn as its own filled area
+    column_width = plot_width / len(columns)
+    points = []
+
+    for index, value in enumerate(columns + [None]):
+        if value is not None:
+            points.append((left + (index + 0.5) * column_width, base - value / top * plot_height))
+            continue
+
+        if points:
+            draw.polygon([(points[0][0], base)] + points + [(points[-1][0], base)], fill=CHART_FILL)
+            draw.line(points + points[-1:], fill=CHART_LINE, width=2)
+            points = []
+
+    image_bytes = io.BytesIO()
+    image.save(image_bytes, format="PNG", optimize=True)
+
+    return image_bytes.getvalue()
+
+
+async def server_history(ip: str, port: int, period_name: str) -> Union[dict, None]:
+    """Player count chart and statistics of game server for period"""
+    period, resolution = HISTORY_PERIODS[period_name]
+    since = datetime.utcnow() - period
+    buckets = await db.find_history(ip, port, resolution, since)
+
+    if not buckets:
+        return None
+
+    samples = sum([bucket["samples"] for bucket in buckets])
+    max_players = max([bucket["max_players"] for bucket in buckets])
+    chart_image = None
+
+    if Image is not None:
+        chart_image = await asyncio.to_thread(render_chart_image, buckets, since, period_name, max_players)
+
+    return {
+        "chart": render_chart(buckets, since, period),
+        "chart_image": chart_image,
+        "peak": max([bucket["players_max"] for bucket in buckets]),
+        "average": sum([bucket["players_sum"] for bucket in buckets]) / samples,
+        "max_players": max_players,
+    }
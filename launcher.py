@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import secrets
+import subprocess
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOT_PORT = 27100
+
+# Discord allows one identify every 5 seconds, bot processes are started one after another
+START_DELAY = 5.0
+RESTART_DELAY = 5.0
+CHECK_INTERVAL = 1.0
+
+logger = logging.getLogger("launcher")
+
+
+def shard_ranges(shard_count: int, processes: int) -> list:
+    """Split shard ids to contiguous ranges of processes as evenly as possible"""
+    size, remainder = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+
+    for index in range(min(processes, shard_count)):
+        end = start + size + (index < remainder)
+        ranges.append(list(range(start, end)))
+        start = end
+
+    return ranges
+
+
+class Launcher:
+    """Runs snapshot worker and bot processes and restarts them when they exit"""
+
+    def __init__(self, shard_count: int, processes: int, snapshot_port: int, start_delay: float = START_DELAY):
+        self.start_delay = start_delay
+        # Worker and bot processes authenticate each other with secret which exists only in their environment
+        self.env = dict(os.environ, SNAPSHOT_PORT=str(snapshot_port),
+                        SNAPSHOT_SECRET=os.getenv("SNAPSHOT_SECRET") or secrets.token_hex(32))
+        self.metrics_port = int(os.getenv("METRICS_PORT", 0))
+
+        # Worker is the first process, every bot process gets its own shards and metrics port
+        self.commands = [("snapshot_service.py", {})]
+
+        for shard_ids in shard_ranges(shard_count, processes):
+            self.commands.append(("main.py", {"SHARD_COUNT": str(shard_count),
+                                              "SHARD_IDS": ",".join(map(str, shard_ids))}))
+
+        self.processes = [None] * len(self.commands)
+
+    def start(self, index: int) -> subprocess.Popen:
+        script, extra_env = self.commands[index]
+        env = dict(self.env, **extra_env)
+
+        if self.metrics_port:
+            env["METRICS_PORT"] = str(self.metrics_port + index)
+
+        logger.info("Starting %s %s", script, extra_env.get("SHARD_IDS", ""))
+        self.processes[index] = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, script)], env=env,
+                                                 cwd=BASE_DIR)
+
+        return self.processes[index]
+
+    def run(self):
+        try:
+            for index in range(len(self.commands)):
+                self.start(index)
+                time.sleep(self.start_delay)
+
+            while True:
+                time.sleep(CHECK_INTERVAL)
+
+                for index, process in enumerate(self.processes):
+                    if process.poll() is not None:
+                        logger.warning("%s exited with code %s", self.commands[index][0], process.returncode)
+                        time.sleep(RESTART_DELAY)
+                        self.start(index)
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            self.stop()
+
+    def stop(self):
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+
+        for process in self.processes:
+            if process is not None:
+                process.wait()
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Run the bot in more processes with shared poller worker")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="bot processes")
+    parser.add_argument("--shards", type=int, help="total shard count, default is one shard per process")
+    parser.add_argument("--snapshot-port", type=int, default=DEFAULT_SNAPSHOT_PORT,
+                        help="local port of poller worker")
+    parser.add_argument("--start-delay", type=float, default=START_DELAY,
+                        help="seconds between starting processes")
+    args = parser.parse_args()
+
+    Launcher(args.shards or args.processes, args.processes, args.snapshot_port, args.start_delay).run()
+
+
+if __name__ == "__main__":
+    main()
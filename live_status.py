@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import a2s
+import discord
+import database_handler as db
+import embeds as emb
+import server_cache
+from typing import Union
+
+# Live messages are refreshed every REFRESH_INTERVAL seconds, there is only one live message per channel,
+# so every channel gets at most one edit per interval. All edits together are spread to GLOBAL_EDITS_PER_SECOND.
+REFRESH_INTERVAL = 30.0
+GLOBAL_EDITS_PER_SECOND = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(embeds: list) -> str:
+    """Hash of rendered embeds without timestamp, so unchanged content can be skipped"""
+    embeds_dicts = []
+
+    for embed in embeds:
+        embed_dict = embed.to_dict()
+        embed_dict.pop("timestamp", None)
+        embeds_dicts.append(embed_dict)
+
+    return hashlib.sha1(json.dumps(embeds_dicts, sort_keys=True).encode()).hexdigest()
+
+
+class LiveStatusScheduler:
+    """Keeps live status messages up to date by editing them in place"""
+
+    def __init__(self, bot: discord.Client, interval: float = REFRESH_INTERVAL,
+                 edits_per_second: float = GLOBAL_EDITS_PER_SECOND):
+        self.bot = bot
+        self.interval = interval
+        self.edit_spacing = 1 / edits_per_second
+        self.live_messages = {}
+        self._last_edit = 0.0
+        self._task = None
+
+    def handles_guild(self, guild_id: int) -> bool:
+        """Whether discord server belongs to shards of this process"""
+        shard_ids = getattr(self.bot, "shard_ids", None)
+
+        return not shard_ids or (guild_id >> 22) % self.bot.shard_count in shard_ids
+
+    async def load(self):
+        """Load live messages saved in database, so they resume after restart"""
+        for live_message in await db.all_live_messages():
+            if self.handles_guild(live_message["guild_id"]):
+                self.live_messages[live_message["channel_id"]] = live_message
+
+    async def render(self, live_message: dict) -> list:
+        """Build stats and players embeds of live message server"""
+        server_info = await db.find_game_server(live_message["guild_id"], live_message["server_name"])
+
+        if not server_info:
+            return [discord.Embed(title=f"Server {live_message['server_name']} was deleted",
+                                  color=discord.Color.red())]
+
+        address = (server_info["ip"], server_info["port"])
+
+        try:
+            stats = await server_cache.get_info(address)
+
+        except (TimeoutError, OSError, a2s.BrokenMessageError):
+            return [discord.Embed(title=f"Server {live_message['server_name']} is offline",
+                                  color=discord.Color.red())]
+
+        embeds = [emb.build_stats_embed(ip=f"{server_info['ip']}:{server_info['port']}",
+                                        description=server_info["description"], game=stats.game,
+                                        server_name=stats.server_name, game_map=stats.map_name,
+                                        players=f"{stats.player_count}/{stats.max_players}")]
+
+        try:
+            players = emb.sort_players(await server_cache.get_players(address))
+
+            # Live message shows only the best players, all of them are listed by players command
+            if players:
+                footer = None
+
+                if len(players) > emb.PLAYERS_PER_PAGE:
+                    footer = f"and {len(players) - emb.PLAYERS_PER_PAGE} more players"
+
+                columns = emb.players_columns(players[:emb.PLAYERS_PER_PAGE])
+                embeds.append(emb.build_players_list_embed(*columns, footer=footer))
+
+        except (TimeoutError, OSError, a2s.BrokenMessageError):
+            pass
+
+        return embeds
+
+    async def add(self, ctx, server_name: str):
+        """Post live message of server to channel, it replaces previous live message of the channel"""
+        live_message = {"guild_id": ctx.guild.id, "channel_id": ctx.channel.id, "server_name": server_name}
+        embeds = await self.render(live_message)
+        message = await ctx.send(embeds=embeds)
+
+        live_message["message_id"] = message.id
+        live_message["content_hash"] = content_hash(embeds)
+        self.live_messages[ctx.channel.id] = live_message
+
+        previous = await db.set_live_message(ctx.guild.id, ctx.channel.id, message.id, server_name)
+
+        if previous and previous["message_id"] != message.id:
+            try:
+                await ctx.channel.get_partial_message(previous["message_id"]).delete()
+
+            except discord.HTTPException:
+                pass
+
+    async def remove(self, channel_id: int) -> Union[dict, None]:
+        """Stop updating live message of channel"""
+        self.live_messages.pop(channel_id, None)
+
+        return await db.del_live_message(channel_id)
+
+    async def _wait_for_edit_slot(self):
+        """Space edits of all live messages, so they don't exhaust global rate limit"""
+        wait = self._last_edit + self.edit_spacing - time.monotonic()
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        self._last_edit = time.monotonic()
+
+    async def refresh_once(self):
+        """Render all live messages and edit those which content changed"""
+        live_messages = list(self.live_messages.values())
+        rendered = await asyncio.gather(*[self.render(live_message) for live_message in live_messages],
+                                        return_exceptions=True)
+
+        for live_message, embeds in zip(live_messages, rendered):
+            if isinstance(embeds, Exception):
+                logger.warning("Rendering live message %s failed: %r", live_message["message_id"], embeds)
+                continue
+
+            new_hash = content_hash(embeds)
+            channel = self.bot.get_channel(live_message["channel_id"])
+
+            # Channel isn't available yet or content is the same as in discord
+            if channel is None or new_hash == live_message.get("content_hash"):
+                continue
+
+            await self._wait_for_edit_slot()
+
+            try:
+                await channel.get_partial_message(live_message["message_id"]).edit(embeds=embeds)
+                live_message["content_hash"] = new_hash
+
+            # Message was deleted or bot can't edit it anymore
+            except (discord.NotFound, discord.Forbidden):
+                await self.remove(live_message["channel_id"])
+
+            except discord.HTTPException as error:
+                logger.warning("Editing live message %s failed: %r", live_message["message_id"], error)
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+
+        while True:
+            started = time.monotonic()
+
+            try:
+                await self.refresh_once()
+
+            except Exception:
+                logger.exception("Refreshing live messages failed")
+
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
@@ -1,57 +1,182 @@
 import os
-import a2s
+import asyncio
+import logging
 import discord
+import alerts
+import history
+import metrics
+import live_status
+import server_cache
+import server_names
+import sessions
+import snapshot_service
+import thumbnails
+import views
 import database_handler as db
 import embeds as emb
 import json
+from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
+from typing import Optional
 from validators import validate_user_server, validate_server_argument, check_user_role, ERROR_COLOR
 
 # Constants
-SCRIPT_DIRECTORY = os.path.abspath(os.path.dirname(__file__))
-MAP_THUMBNAILS_DIR = f'{SCRIPT_DIRECTORY}/map-thumbnails/'
-GAMES_IN_THUMBNAILS_DIR = os.listdir(MAP_THUMBNAILS_DIR)
-NOT_ALLOWED_CHAR_IN_DIR = ('\\', '/', ':', '*', '?', '"', '<', '>', '|')
-ALLOWED_PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
 BOT_PREFIX = "!"
+STATUS_DEADLINE = 5.0
+GUILD_BOOTSTRAP_DELAY = 2.0
+AUTOCOMPLETE_LIMIT = 25
 
 # Load discord token (API) from env
 load_dotenv()
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 
+# Shards of this process when it is started by launcher.py
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 0))
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS', '').split(',') if shard_id]
+
+logger = logging.getLogger(__name__)
+
 # Load discord intents
 intents = discord.Intents.default()
 intents.message_content = True
 
 # Define discord bot
-bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents, help_command=None)
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix=BOT_PREFIX, intents=intents, help_command=None,
+                                  shard_count=SHARD_COUNT, shard_ids=SHARD_IDS or None)
+
+else:
+    bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents, help_command=None)
+
+live_scheduler = live_status.LiveStatusScheduler(bot)
+help_messages = {}
+
+
+# Load help messages, connect to database, load thumbnails, start background tasks and metrics endpoint
+@bot.event
+async def setup_hook():
+    load_help_messages()
+    await db.connect()
+    await thumbnails.index.start()
+
+    alerts.manager.client = bot
+
+    # Game servers are polled and alerts are sent by snapshot worker when bot runs in more processes
+    if snapshot_service.SNAPSHOT_PORT:
+        server_cache.remote = snapshot_service.SnapshotClient()
+
+    else:
+        await alerts.manager.load()
+        server_cache.poller.add_listener(history.recorder.record)
+        server_cache.poller.add_listener(sessions.tracker.record)
+        server_cache.poller.add_listener(alerts.manager.record)
+        server_cache.poller.add_cycle_listener(alerts.manager.flush)
+        server_cache.poller.add_retainer(sessions.tracker.retain)
+        server_cache.poller.start()
+        history.recorder.start()
+        sessions.tracker.start()
+
+    await live_scheduler.load()
+    live_scheduler.start()
+
+    await metrics.start_server()
+
+    # Slash commands are registered by the process with the first shard only
+    if not SHARD_IDS or 0 in SHARD_IDS:
+        await bot.tree.sync()
+
+
+# Measure time and errors of every command
+@bot.before_invoke
+async def before_command(ctx):
+    metrics.start_command(ctx)
+
+
+@bot.after_invoke
+async def after_command(ctx):
+    metrics.finish_command(ctx)
+
+
+@bot.event
+async def on_command_error(ctx, error):
+    metrics.command_failed(ctx, error)
+    await commands.Bot.on_command_error(bot, ctx, error)
+
+
+# Guilds waiting for default config, they are created together with one bulk write
+pending_guild_ids = set()
+guild_bootstrap_task = None
+guilds_bootstrapped = False
+
+
+async def bootstrap_pending_guilds():
+    while pending_guild_ids:
+        await asyncio.sleep(GUILD_BOOTSTRAP_DELAY)
+        guild_ids = list(pending_guild_ids)
+        pending_guild_ids.clear()
+
+        # Failed discord servers are created again with the next batch
+        try:
+            await db.create_default_configs(guild_ids)
+
+        except Exception:
+            logger.exception("Creating default configs of %d discord servers failed", len(guild_ids))
+            pending_guild_ids.update(guild_ids)
+
+
+def queue_guild_bootstrap(guild_id: int):
+    global guild_bootstrap_task
+
+    pending_guild_ids.add(guild_id)
+
+    if guild_bootstrap_task is None or guild_bootstrap_task.done():
+        guild_bootstrap_task = asyncio.create_task(bootstrap_pending_guilds())
 
 
 # Create default config for the server, when the bot is added
 @bot.event
 async def on_guild_join(guild):
-    db.create_default_config(guild.id)
+    queue_guild_bootstrap(guild.id)
 
 
-# Create default config if not exists when discord server is available
+# Create default config if not exists when discord server becomes available again, at startup on_ready does it
 @bot.event
 async def on_guild_available(guild):
-    db.create_default_config(guild.id)
+    if bot.is_ready():
+        queue_guild_bootstrap(guild.id)
 
 
-# Read all commands and their help messages from json and if not command in json insert it
+# Create default config for all servers which don't have it yet, on_ready fires again after every reconnect
+# and servers available later are created by on_guild_available, so this runs only once
 @bot.event
 async def on_ready():
+    global guilds_bootstrapped
+
+    if guilds_bootstrapped:
+        return
+
+    guilds_bootstrapped = True
+    guild_ids = [guild.id for guild in bot.guilds]
+
+    try:
+        await db.create_default_configs(guild_ids)
+
+    except Exception:
+        logger.exception("Creating default configs of %d discord servers failed, retrying", len(guild_ids))
+
+        for guild_id in guild_ids:
+            queue_guild_bootstrap(guild_id)
+
+
+def load_help_messages():
+    """Read all commands and their help messages from json, commands not in json get empty help message"""
     with open('help_messages.json', 'r') as json_file:
-        commands_help = json.load(json_file)
+        help_messages.update(json.load(json_file))
 
     for command in bot.commands:
-        if command.name not in commands_help.keys():
-            commands_help[command.name] = {"help_message": "", "usage": "", "example": ""}
-
-    with open('help_messages.json', 'w') as json_file:
-        json.dump(commands_help, json_file, indent=4, sort_keys=True)
+        if command.name not in help_messages.keys():
+            help_messages[command.name] = {"help_message": "", "usage": "", "example": ""}
 
 
 @bot.command(name='help')
@@ -63,9 +188,6 @@ async def help_func(ctx, command_name: str = None):
         command = bot.get_command(command_name)
 
         if command:
-            with open('help_messages.json', 'r') as json_file:
-                help_messages = json.load(json_file)
-
             command_help = help_messages[command_name]["help_message"]
             command_usage = help_messages[command_name]["usage"]
             command_example = help_messages[command_name]["example"]
@@ -87,7 +209,7 @@ async def help_func(ctx, command_name: str = None):
 async def servers_list_func(ctx):
     """Displays all available game servers"""
 
-    servers = db.all_game_servers(ctx.guild.id)
+    servers = await db.all_game_servers(ctx.guild.id)
 
     if servers:
         servers_str = ', '.join([server for server in servers])
@@ -99,28 +221,55 @@ async def servers_list_func(ctx):
                              color=ERROR_COLOR)
 
 
+@bot.command(name='status')
+async def status_func(ctx):
+    """Displays online state, map and players of all game servers at once"""
+
+    game_servers = await db.all_game_servers(ctx.guild.id)
+
+    if not game_servers:
+        await emb.send_embed(ctx, title="No servers available",
+                             description="Sorry, no servers are currently available.",
+                             color=ERROR_COLOR)
+        return
+
+    # Query all servers concurrently, servers which don't respond until deadline are marked as timed out
+    queries = {}
+
+    for server_name in game_servers:
+        server_info = await db.find_game_server(ctx.guild.id, server_name)
+        queries[server_name] = asyncio.create_task(server_cache.get_info((server_info["ip"], server_info["port"])))
+
+    done, pending = await asyncio.wait(queries.values(), timeout=STATUS_DEADLINE)
+
+    for query in pending:
+        query.cancel()
+
+    server_statuses = []
+
+    for server_name, query in queries.items():
+        if query in pending:
+            server_statuses.append({"name": server_name, "state": "timeout"})
+
+        elif query.exception():
+            server_statuses.append({"name": server_name, "state": "offline"})
+
+        else:
+            stats = query.result()
+            server_statuses.append({"name": server_name, "state": "online", "map": stats.map_name,
+                                    "players": f"{stats.player_count}/{stats.max_players}"})
+
+    await emb.send_status_embeds(ctx, server_statuses)
+
+
 @bot.command(name='stats')
 @validate_server_argument
 async def server_stats_func(ctx, server_name: str = None, server_info: dict = None):
     """Returns information about a game server."""
 
     ip_and_port = f"{server_info['ip']}:{server_info['port']}"
-    stats = a2s.info((server_info["ip"], server_info["port"]))
-    game_name = ''.join([char for char in stats.game if char not in NOT_ALLOWED_CHAR_IN_DIR])
-    all_thumbnails = []
-    map_thumbnail = None
-
-    if game_name in GAMES_IN_THUMBNAILS_DIR:
-        all_thumbnails = os.listdir(f'{MAP_THUMBNAILS_DIR}/{game_name}')
-
-    # Find thumbnail for server map
-    for extension in ALLOWED_PHOTO_EXTENSIONS:
-        map_with_extension = stats.map_name + extension
-
-        # Check if server game is in thumbnails dir and map name in server game dir
-        if game_name in GAMES_IN_THUMBNAILS_DIR and map_with_extension in all_thumbnails:
-            map_thumbnail = f'{MAP_THUMBNAILS_DIR}/{game_name}/{map_with_extension}'
-            break
+    stats = await server_cache.get_info((server_info["ip"], server_info["port"]))
+    map_thumbnail = thumbnails.index.find(stats.game, stats.map_name)
 
     await emb.send_stats_embed(ctx, game=stats.game, server_name=stats.server_name, ip=ip_and_port,
                                description=server_info["description"],
@@ -133,21 +282,75 @@ async def server_stats_func(ctx, server_name: str = None, server_info: dict = No
 async def players_info_func(ctx, server_name: str = None, server_info: dict = None):
     """Returns a list of players on the game server, along with their scores and playtime"""
 
-    players = a2s.players((server_info["ip"], server_info["port"]))
-    players = [player for player in players if player.name]
+    players = await server_cache.get_players((server_info["ip"], server_info["port"]))
+    players_view = views.PlayersView(players, ctx.author.id)
 
-    if players:
-        players_sorted = sorted(players, key=lambda player: player.score, reverse=True)
+    if players_view.player_count:
+        players_view.message = await ctx.send(embed=players_view.render(), view=players_view)
 
-        player_names = "\n".join([player.name for player in players_sorted])
-        player_scores = "\n".join([str(player.score) for player in players_sorted])
-        player_playtime = "\n".join([f"{int(player.duration // 60)} min" for player in players_sorted])
+    else:
+        await emb.send_embed(ctx, title="No active players on the server", color=ERROR_COLOR)
+
+
+@bot.command(name="history")
+@validate_server_argument(pass_args=True)
+async def history_func(ctx, server_name: str = None, server_info: dict = None,
+                       period: str = history.DEFAULT_HISTORY_PERIOD):
+    """Displays player count chart of a game server"""
+
+    if period not in history.HISTORY_PERIODS:
+        periods = ', '.join(history.HISTORY_PERIODS)
+        await emb.send_embed(ctx, title="Unknown history period", description=f"Choose one of `{periods}`",
+                             color=ERROR_COLOR)
+        return
+
+    server_history = await history.server_history(server_info["ip"], server_info["port"], period)
 
-        await emb.send_players_list_embed(ctx, player_names=player_names, player_scores=player_scores,
-                                          player_playtime=player_playtime)
+    if server_history:
+        await emb.send_history_embed(ctx, server_name, period, **server_history)
 
     else:
-        await emb.send_embed(ctx, title="No active players on the server", color=ERROR_COLOR)
+        await emb.send_embed(ctx, title="No history for this server yet", color=ERROR_COLOR)
+
+
+@bot.command(name="top")
+@validate_server_argument(pass_args=True)
+async def top_players_func(ctx, server_name: str = None, server_info: dict = None,
+                           period: str = sessions.DEFAULT_LEADERBOARD_PERIOD):
+    """Displays players with the longest playtime on a game server"""
+
+    if period not in sessions.LEADERBOARD_PERIODS:
+        periods = ', '.join(sessions.LEADERBOARD_PERIODS)
+        await emb.send_embed(ctx, title="Unknown leaderboard period", description=f"Choose one of `{periods}`",
+                             color=ERROR_COLOR)
+        return
+
+    top_players = await db.find_top_players(server_info["ip"], server_info["port"], period,
+                                            sessions.LEADERBOARD_SIZE)
+
+    if top_players:
+        await emb.send_top_players_embed(ctx, server_name, period, top_players)
+
+    else:
+        await emb.send_embed(ctx, title="No playtime recorded for this server yet", color=ERROR_COLOR)
+
+
+@bot.command(name="player")
+async def player_func(ctx, *, player_name: str = None):
+    """Displays playtime of a player on game servers of the discord server"""
+
+    if not player_name:
+        await emb.send_embed(ctx, title="You didn't write player name", color=ERROR_COLOR,
+                             description="Use this command like this: `!player PlayerName`")
+        return
+
+    playtime = await db.find_player_playtime(ctx.guild.id, player_name)
+
+    if playtime:
+        await emb.send_player_embed(ctx, player_name, playtime)
+
+    else:
+        await emb.send_embed(ctx, title="Player not found", color=ERROR_COLOR)
 
 
 @bot.command(name="add_server")
@@ -158,7 +361,7 @@ async def add_server_func(ctx, server_name: str, server_ip: str, server_descript
 
     ip, port = server_ip.split(":")
     description_str = ' '.join(server_description)
-    server_add = db.add_game_server(ctx.guild.id, server_name, ip, int(port), description_str)
+    server_add = await db.add_game_server(ctx.guild.id, server_name, ip, int(port), description_str)
 
     if server_add:
         await emb.send_embed(ctx, title=f"You have successfully added server {server_name}",
@@ -173,10 +376,11 @@ async def add_server_func(ctx, server_name: str, server_ip: str, server_descript
 async def del_server_func(ctx, server_name: str = None):
     """Deletes a game server from the list"""
 
-    server_exists = db.find_game_server(ctx.guild.id, server_name)
+    server_exists = await db.find_game_server(ctx.guild.id, server_name)
 
     if server_exists:
-        server_deleted = db.del_game_server(ctx.guild.id, server_name)
+        server_deleted = await db.del_game_server(ctx.guild.id, server_name)
+        alerts.manager.forget(ctx.guild.id, server_name)
 
         if server_deleted:
             await emb.send_embed(ctx, title=f"You have successfully deleted server {server_name}",
@@ -185,11 +389,88 @@ async def del_server_func(ctx, server_name: str = None):
             await emb.send_embed(ctx, title="Sorry, something went wrong")
 
     else:
-        all_servers = ', '.join([server for server in db.all_game_servers(ctx.guild.id)])
+        all_servers = ', '.join([server for server in await db.all_game_servers(ctx.guild.id)])
         await emb.send_embed(ctx, title="You need to choose one of this servers",
                              description=f"`{all_servers}`", color=ERROR_COLOR)
 
 
+@bot.command(name="live")
+@check_user_role
+@validate_server_argument
+async def live_status_func(ctx, server_name: str = None, server_info: dict = None):
+    """Posts server stats message to the channel which is kept up to date"""
+
+    await live_scheduler.add(ctx, server_name)
+
+
+@bot.command(name="unlive")
+@check_user_role
+async def stop_live_status_func(ctx):
+    """Stops updating live server stats message in the channel"""
+
+    live_message = await live_scheduler.remove(ctx.channel.id)
+
+    if live_message:
+        await emb.send_embed(ctx, title="Live server stats message is no longer updated",
+                             color=discord.Color.green())
+
+    else:
+        await emb.send_embed(ctx, title="There is no live server stats message in this channel", color=ERROR_COLOR)
+
+
+@bot.command(name="alert")
+@check_user_role
+@validate_server_argument(pass_args=True)
+async def alert_func(ctx, server_name: str = None, server_info: dict = None, event: str = None,
+                     threshold: str = None):
+    """Subscribes the channel to an event of a game server"""
+
+    if event not in alerts.ALERT_EVENTS:
+        events = ', '.join(alerts.ALERT_EVENTS)
+        await emb.send_embed(ctx, title="Unknown alert event", description=f"Choose one of `{events}`",
+                             color=ERROR_COLOR)
+        return
+
+    if event == "players" and not (threshold and threshold.isdigit()):
+        await emb.send_embed(ctx, title="You didn't write player count", color=ERROR_COLOR,
+                             description="Use this command like this: `!alert mycsgoserver players 20`")
+        return
+
+    await alerts.manager.subscribe(ctx.guild.id, ctx.channel.id, server_name, server_info, event,
+                                   int(threshold) if event == "players" else None)
+    await emb.send_embed(ctx, title=f"Alerts of {server_name} will be sent to this channel",
+                         description=alerts.ALERT_EVENTS[event], color=discord.Color.green())
+
+
+@bot.command(name="unalert")
+@check_user_role
+async def unalert_func(ctx, server_name: str = None, event: str = None):
+    """Stops sending an alert of a game server to the channel"""
+
+    alert = await alerts.manager.unsubscribe(ctx.channel.id, server_name, event)
+
+    if alert:
+        await emb.send_embed(ctx, title=f"Alerts of {server_name} are no longer sent to this channel",
+                             description=alerts.ALERT_EVENTS[event], color=discord.Color.green())
+
+    else:
+        await emb.send_embed(ctx, title="This channel doesn't have such alert", color=ERROR_COLOR,
+                             description="Use this command like this: `!unalert mycsgoserver map`")
+
+
+@bot.command(name="alerts")
+async def alerts_list_func(ctx):
+    """Displays alerts of all channels of the discord server"""
+
+    guild_alerts = await db.guild_alerts(ctx.guild.id)
+
+    if guild_alerts:
+        await emb.send_alerts_embed(ctx, guild_alerts)
+
+    else:
+        await emb.send_embed(ctx, title="No alerts in this discord server", color=ERROR_COLOR)
+
+
 @bot.command(name="info")
 @validate_server_argument
 async def info_server_func(ctx, server_name: str = None, server_info: dict = None):
@@ -198,4 +479,84 @@ async def info_server_func(ctx, server_name: str = None, server_info: dict = Non
     await emb.send_info_embed(ctx, server_name, server_info)
 
 
-bot.run(DISCORD_TOKEN)
+# Slash commands defer the response right away and run callbacks of prefix commands
+async def server_name_autocomplete(interaction: discord.Interaction, current: str) -> list:
+    """Server names starting with typed text, discord server is loaded from database only once"""
+    if not server_names.index.is_loaded(interaction.guild_id):
+        await db.all_game_servers(interaction.guild_id)
+
+    return [app_commands.Choice(name=server_name, value=server_name)
+            for server_name in server_names.index.complete(interaction.guild_id, current, AUTOCOMPLETE_LIMIT)]
+
+
+async def run_slash_command(interaction: discord.Interaction, command: commands.Command, *args):
+    """Defer so slow queries don't miss interaction deadline, then run prefix command with interaction context"""
+    await interaction.response.defer()
+    ctx = await commands.Context.from_interaction(interaction)
+    metrics.start_command(ctx)
+
+    try:
+        await command.callback(ctx, *args)
+
+    except Exception as error:
+        metrics.command_failed(ctx, error)
+        raise
+
+    finally:
+        metrics.finish_command(ctx)
+
+
+@bot.tree.command(name="help", description="List of commands or help of one command")
+@app_commands.describe(command="Name of the command")
+async def help_slash(interaction: discord.Interaction, command: Optional[str] = None):
+    await run_slash_command(interaction, help_func, command)
+
+
+@bot.tree.command(name="servers", description="List of all servers")
+@app_commands.guild_only()
+async def servers_slash(interaction: discord.Interaction):
+    await run_slash_command(interaction, servers_list_func)
+
+
+@bot.tree.command(name="stats", description="Stats of the server like game, name, map and player count")
+@app_commands.guild_only()
+@app_commands.describe(server="Name of the server")
+@app_commands.autocomplete(server=server_name_autocomplete)
+async def stats_slash(interaction: discord.Interaction, server: Optional[str] = None):
+    await run_slash_command(interaction, server_stats_func, server)
+
+
+@bot.tree.command(name="players", description="All players of the server with their scores and playtime")
+@app_commands.guild_only()
+@app_commands.describe(server="Name of the server")
+@app_commands.autocomplete(server=server_name_autocomplete)
+async def players_slash(interaction: discord.Interaction, server: Optional[str] = None):
+    await run_slash_command(interaction, players_info_func, server)
+
+
+@bot.tree.command(name="info", description="Stored information about the server")
+@app_commands.guild_only()
+@app_commands.describe(server="Name of the server")
+@app_commands.autocomplete(server=server_name_autocomplete)
+async def info_slash(interaction: discord.Interaction, server: Optional[str] = None):
+    await run_slash_command(interaction, info_server_func, server)
+
+
+@bot.tree.command(name="add_server", description="Add game server, requires games server manager role")
+@app_commands.guild_only()
+@app_commands.describe(server="Name of the new server", address="Ip and port like 10.20.30.40:27015",
+                       description="Description of the server")
+async def add_server_slash(interaction: discord.Interaction, server: str, address: str, description: str):
+    await run_slash_command(interaction, add_server_func, server, address, *description.split())
+
+
+@bot.tree.command(name="del_server", description="Delete game server, requires games server manager role")
+@app_commands.guild_only()
+@app_commands.describe(server="Name of the server")
+@app_commands.autocomplete(server=server_name_autocomplete)
+async def del_server_slash(interaction: discord.Interaction, server: str):
+    await run_slash_command(interaction, del_server_func, server)
+
+
+if __name__ == "__main__":
+    bot.run(DISCORD_TOKEN)
@@ -0,0 +1,284 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import discord
+from collections import Counter as StackCounter, defaultdict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from functools import wraps
+from typing import Callable, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+# Metrics are served on http://METRICS_HOST:METRICS_PORT/metrics, the endpoint is disabled when port is 0.
+# Settings are read when the endpoint starts, launcher.py gives every process its own port.
+load_dotenv()
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_INTERVAL = 0.005
+PROFILE_MAX_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+registry = []
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    labels = [f'{name}="{value}"' for name, value in zip(names, values)]
+
+    if extra:
+        labels.append(extra)
+
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = defaultdict(float)
+        registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        self.values[tuple(labels.get(name, "") for name in self.labels)] += amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+
+        for values, count in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {count}")
+
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+        registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        series = self.values.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["buckets"][index] += 1
+
+        series["sum"] += value
+        series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+
+        for values, series in self.values.items():
+            for bound, count in zip(self.buckets, series["buckets"]):
+                bucket_labels = _format_labels(self.labels, values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+
+            bucket_labels = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {series['count']}")
+
+        return lines
+
+
+class Gauge:
+    """Value read from callback when metrics are rendered"""
+
+    def __init__(self, name: str, description: str, callback: Callable, metric_type: str = "gauge"):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self.metric_type = metric_type
+        registry.append(self)
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}",
+                f"{self.name} {self.callback()}"]
+
+
+# Metrics of the bot
+COMMAND_SECONDS = Histogram("gamestatsbot_command_seconds", "Time to handle command", ("command",))
+COMMAND_ERRORS = Counter("gamestatsbot_command_errors_total", "Failed commands by error type", ("command", "error"))
+DISCORD_SEND_SECONDS = Histogram("gamestatsbot_discord_send_seconds", "Time to send message to discord")
+A2S_QUERY_SECONDS = Histogram("gamestatsbot_a2s_query_seconds", "Time of live A2S query", ("query",))
+A2S_QUERY_ERRORS = Counter("gamestatsbot_a2s_query_errors_total", "Failed live A2S queries by error type",
+                           ("query", "error"))
+POLL_SECONDS = Histogram("gamestatsbot_poll_seconds", "Time to scan all game servers",
+                         buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+DATABASE_SECONDS = Histogram("gamestatsbot_database_seconds", "Time of database operation", ("operation",))
+DATABASE_ERRORS = Counter("gamestatsbot_database_errors_total", "Failed database operations by error type",
+                          ("operation", "error"))
+CACHE_REQUESTS = Counter("gamestatsbot_cache_requests_total", "Cache lookups by cache and result",
+                         ("cache", "result"))
+
+
+def _cache_hit_ratio(cache: str) -> float:
+    hits = CACHE_REQUESTS.get(cache=cache, result="hit")
+    total = hits + CACHE_REQUESTS.get(cache=cache, result="miss")
+
+    return hits / total if total else 0.0
+
+
+Gauge("gamestatsbot_snapshot_cache_hit_ratio", "Share of A2S requests answered from snapshot cache",
+      lambda: _cache_hit_ratio("snapshot"))
+Gauge("gamestatsbot_guild_cache_hit_ratio", "Share of game server lookups answered from guild cache",
+      lambda: _cache_hit_ratio("guild"))
+
+
+def error_type(error: BaseException) -> str:
+    """Short name of error used as label"""
+    if isinstance(error, TimeoutError):
+        return "timeout"
+
+    if isinstance(error, discord.HTTPException) and error.status == 429:
+        return "rate_limit"
+
+    return type(error).__name__
+
+
+def timed(histogram: Histogram, errors: Counter):
+    """Decorator measuring time and errors of coroutine function, first label of metrics is function name"""
+
+    def decorator(func):
+        labels = {histogram.labels[0]: func.__name__}
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                with histogram.time(**labels):
+                    return await func(*args, **kwargs)
+
+            except Exception as error:
+                errors.inc(error=error_type(error), **labels)
+                raise
+
+        return wrapper
+
+    return decorator
+
+
+def start_command(ctx):
+    """Called before command, measures time of every message sent to discord during command"""
+    ctx.metrics_started = time.perf_counter()
+    send = ctx.send
+
+    async def timed_send(*args, **kwargs):
+        with DISCORD_SEND_SECONDS.time():
+            return await send(*args, **kwargs)
+
+    ctx.send = timed_send
+
+
+def finish_command(ctx):
+    """Called after command even when it failed"""
+    if hasattr(ctx, "metrics_started"):
+        COMMAND_SECONDS.observe(time.perf_counter() - ctx.metrics_started, command=ctx.command.qualified_name)
+
+
+def command_failed(ctx, error: BaseException):
+    """Count error of command, discord.py wraps errors raised in command into CommandInvokeError"""
+    command = ctx.command.qualified_name if ctx.command else ""
+    COMMAND_ERRORS.inc(command=command, error=error_type(getattr(error, "original", error)))
+
+
+def render() -> str:
+    """All metrics in Prometheus text format"""
+    lines = []
+
+    for metric in registry:
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float = PROFILE_INTERVAL) -> str:
+    """Sample stack of thread for seconds, returns collapsed stacks with counts usable by flame graph tools"""
+    stacks = StackCounter()
+    end = time.monotonic() + seconds
+
+    while time.monotonic() < end:
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+
+        while frame is not None:
+            stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+            frame = frame.f_back
+
+        if stack:
+            stacks[";".join(reversed(stack))] += 1
+
+        time.sleep(interval)
+
+    return "\n".join([f"{stack} {count}" for stack, count in stacks.most_common()]) + "\n"
+
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, loop_thread_id: int):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+
+        # Skip headers
+        while (await reader.readline()).strip():
+            pass
+
+        url = urlparse(request_line[1] if len(request_line) > 1 else "/")
+        status = "200 OK"
+
+        if url.path == "/metrics":
+            body = render()
+
+        # Sampling profiler of event loop thread, e.g. curl http://127.0.0.1:9100/debug/profile?seconds=30
+        elif url.path == "/debug/profile":
+            seconds = min(float(parse_qs(url.query).get("seconds", ["10"])[0]), PROFILE_MAX_SECONDS)
+            body = await asyncio.to_thread(sample_stacks, loop_thread_id, seconds)
+
+        else:
+            status, body = "404 Not Found", "Not found\n"
+
+        response_body = body.encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                     f"Content-Length: {len(response_body)}\r\nConnection: close\r\n\r\n".encode() + response_body)
+        await writer.drain()
+
+    except (ConnectionError, ValueError) as error:
+        logger.debug("Metrics request failed: %r", error)
+
+    finally:
+        writer.close()
+
+
+async def start_server(host: str = None, port: int = None) -> Union[asyncio.AbstractServer, None]:
+    """Serve metrics and profiler over HTTP, returns None when the endpoint is disabled"""
+    host = host or os.getenv("METRICS_HOST", DEFAULT_METRICS_HOST)
+    port = int(os.getenv("METRICS_PORT", 0)) if port is None else port
+
+    if not port:
+        return None
+
+    loop_thread_id = threading.get_ident()
+    server = await asyncio.start_server(lambda reader, writer: _handle_request(reader, writer, loop_thread_id),
+                                        host, port)
+    logger.info("Metrics are served on http://%s:%s/metrics", host, port)
+
+    return server
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import database_handler as db
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+BATCH_SIZE = 500
+LEGACY_INDEX_NAME = "guild_id_1_name_1"
+
+
+def migrate_batch(batch_size: int) -> int:
+    """Move game servers of one batch of discord servers to game servers collection, returns count of discord servers"""
+    query = {"servers": {"$exists": True}}
+    discord_servers = list(db.servers_collection.find(query, {"guild_id": 1, "servers": 1}).limit(batch_size))
+
+    if not discord_servers:
+        return 0
+
+    operations = []
+    guild_ids = []
+
+    for discord_server in discord_servers:
+        for server_name, game_server in discord_server["servers"].items():
+            # Insert only, game server changed by bot after it was already migrated is kept
+            operations.append(UpdateOne({"guild_id": discord_server["guild_id"], "name": server_name},
+                                        {"$setOnInsert": {"ip": game_server["ip"], "port": game_server["port"],
+                                                          "description": game_server["description"]}},
+                                        upsert=True))
+            guild_ids.append(discord_server["guild_id"])
+
+    upserted_ids = {}
+
+    if operations:
+        result = db.game_servers_collection.bulk_write(operations, ordered=False)
+        upserted_ids = result.upserted_ids
+
+    # Nested servers are removed only after they were copied and only if the bot didn't change them meanwhile,
+    # so interrupted migration can be run again
+    db.servers_collection.bulk_write([UpdateOne({"_id": discord_server["_id"], "servers": discord_server["servers"]},
+                                                {"$unset": {"servers": ""}}) for discord_server in discord_servers],
+                                     ordered=False)
+
+    # Server deleted by del_server during copying would be inserted again, copies of changed discord servers are
+    # removed and they are copied in next batch from their current servers
+    migrated_ids = [discord_server["_id"] for discord_server in discord_servers]
+    changed_query = {"_id": {"$in": migrated_ids}, "servers": {"$exists": True}}
+    changed_guild_ids = {discord_server["guild_id"] for discord_server in
+                         db.servers_collection.find(changed_query, {"guild_id": 1})}
+    stale_ids = [upserted_id for index, upserted_id in upserted_ids.items() if guild_ids[index] in changed_guild_ids]
+
+    if stale_ids:
+        db.game_servers_collection.delete_many({"_id": {"$in": stale_ids}})
+
+    return len(discord_servers)
+
+
+def migrate(batch_size: int = BATCH_SIZE):
+    """Migrate all discord servers and drop index of old layout"""
+    migrated = 0
+
+    while True:
+        batch_count = migrate_batch(batch_size)
+
+        if not batch_count:
+            break
+
+        migrated += batch_count
+        print(f"Migrated {migrated} discord servers")
+
+    try:
+        db.servers_collection.drop_index(LEGACY_INDEX_NAME)
+        print(f"Dropped index {LEGACY_INDEX_NAME}")
+
+    except OperationFailure:
+        pass
+
+    print("Migration finished")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move game servers from discord server documents "
+                                                 "to one document per game server")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    # Migration doesn't use discord servers cache, so it doesn't watch changes
+    asyncio.run(db.connect(watch=False))
+    migrate(args.batch_size)
+    db.close()
@@ -0,0 +1,280 @@
+import io
+import bz2
+import time
+import socket
+import asyncio
+import logging
+import zlib
+import dns_resolver
+from a2s.byteio import ByteReader
+from a2s.info import InfoProtocol
+from a2s.players import PlayersProtocol
+from typing import Iterable, Tuple, Union
+
+# Scanner settings
+SCANNER_SOCKETS = 4
+PACKETS_PER_SECOND = 2000
+SCAN_TIMEOUT = 2.0
+SCAN_RETRIES = 1
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+ENCODING = "utf-8"
+
+HEADER_SIMPLE = b"\xFF\xFF\xFF\xFF"
+HEADER_SPLIT = b"\xFE\xFF\xFF\xFF"
+A2S_CHALLENGE_RESPONSE = 0x41
+NO_CHALLENGE = 0xFFFFFFFF
+MAX_CHALLENGE_ROUNDS = 3
+
+logger = logging.getLogger(__name__)
+
+
+class ScanError(Exception):
+    pass
+
+
+class PacketBudget:
+    """Spreads packets sent by all queries to packets_per_second"""
+
+    def __init__(self, packets_per_second: float = PACKETS_PER_SECOND):
+        self.spacing = 1 / packets_per_second
+        self._next_slot = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.spacing
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _split_format(fragment: bytes) -> Union[str, None]:
+    """Recognize first packet of split response, other packets don't say which engine sent them"""
+    # GoldSource: id, one byte with packet number (upper 4 bits) and count, payload with simple header
+    if fragment[4] >> 4 == 0 and fragment[5:9] == HEADER_SIMPLE:
+        return "goldsource"
+
+    # Source: id, count, number, packet size, compressed packet has decompressed size and crc, payload
+    compressed = bool(int.from_bytes(fragment[0:4], "little") & 0x80000000)
+    payload_start = 16 if compressed else 8
+
+    if fragment[5] == 0 and (compressed or fragment[payload_start:payload_start + 4] == HEADER_SIMPLE):
+        return "source"
+
+    return None
+
+
+def _reassemble(fragments: dict, split_format: str) -> Union[bytes, None]:
+    """Join fragments of one split response if all of them arrived"""
+    parts = {}
+    first = None
+
+    for fragment in fragments.values():
+        if split_format == "goldsource":
+            number, count = fragment[4] >> 4, fragment[4] & 0x0F
+            parts[number] = fragment[5:]
+
+        else:
+            count, number = fragment[4], fragment[5]
+            compressed = bool(int.from_bytes(fragment[0:4], "little") & 0x80000000)
+            parts[number] = fragment[16 if compressed and number == 0 else 8:]
+
+        if number == 0:
+            first = fragment
+
+    if first is None or len(parts) < count:
+        return None
+
+    payload = b"".join([parts[number] for number in range(count)])
+
+    # Compressed Source response, first packet has decompressed size and crc32
+    if split_format == "source" and int.from_bytes(first[0:4], "little") & 0x80000000:
+        payload = bz2.decompress(payload)
+
+        if zlib.crc32(payload) != int.from_bytes(first[12:16], "little"):
+            raise ScanError("Split response checksum mismatch")
+
+    return payload
+
+
+class _ScannerProtocol(asyncio.DatagramProtocol):
+    """One UDP socket shared by many endpoints, responses are matched by source address"""
+
+    def __init__(self):
+        self.transport = None
+        self.waiters = {}
+        self.fragments = {}
+        self.split_formats = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+
+        except OSError:
+            pass
+
+    def datagram_received(self, data: bytes, address: Tuple):
+        address = address[:2]
+
+        if address not in self.waiters:
+            return
+
+        if data[:4] == HEADER_SIMPLE:
+            self._deliver(address, data[4:])
+
+        elif data[:4] == HEADER_SPLIT and len(data) > 9:
+            self._split_received(address, data[4:])
+
+    def _split_received(self, address: Tuple, fragment: bytes):
+        message_id = fragment[0:4]
+        fragments = self.fragments.setdefault((address, message_id), {})
+
+        # Packet number and count are in these bytes in both formats, so resent packets replace themselves
+        fragments[fragment[4:6]] = fragment
+
+        # Engine of endpoint is remembered, so its next split responses are decoded even when first packet comes late
+        split_format = _split_format(fragment) or self.split_formats.get(address)
+
+        if split_format is None:
+            for other_fragment in fragments.values():
+                split_format = split_format or _split_format(other_fragment)
+
+        if split_format is None:
+            return
+
+        self.split_formats[address] = split_format
+
+        try:
+            payload = _reassemble(fragments, split_format)
+
+        except (OSError, ValueError, ScanError) as error:
+            del self.fragments[(address, message_id)]
+            self._fail(address, ScanError(f"Broken split response: {error!r}"))
+            return
+
+        if payload is not None:
+            del self.fragments[(address, message_id)]
+            self._deliver(address, payload[4:] if payload.startswith(HEADER_SIMPLE) else payload)
+
+    def _deliver(self, address: Tuple, payload: bytes):
+        waiter = self.waiters.pop(address, None)
+
+        if waiter and not waiter.done():
+            waiter.set_result(payload)
+
+    def _fail(self, address: Tuple, error: Exception):
+        waiter = self.waiters.pop(address, None)
+
+        if waiter and not waiter.done():
+            waiter.set_exception(error)
+
+    def forget(self, address: Tuple):
+        """Drop unfinished split responses of endpoint"""
+        self.waiters.pop(address, None)
+
+        for key in [key for key in self.fragments if key[0] == address]:
+            del self.fragments[key]
+
+
+class A2SScanner:
+    """Queries info and players of many game servers over a few non-blocking UDP sockets"""
+
+    def __init__(self, sockets: int = SCANNER_SOCKETS, packets_per_second: float = PACKETS_PER_SECOND,
+                 timeout: float = SCAN_TIMEOUT, retries: int = SCAN_RETRIES):
+        self.socket_count = sockets
+        self.budget = PacketBudget(packets_per_second)
+        self.timeout = timeout
+        self.retries = retries
+        self.protocols = []
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+
+        while len(self.protocols) < self.socket_count:
+            _, protocol = await loop.create_datagram_endpoint(_ScannerProtocol, local_addr=("0.0.0.0", 0))
+            self.protocols.append(protocol)
+
+    def close(self):
+        for protocol in self.protocols:
+            protocol.transport.close()
+
+        self.protocols = []
+
+    async def _request(self, protocol: _ScannerProtocol, address: Tuple[str, int], request: bytes) -> bytes:
+        """Send request and wait for response, resend it after timeout"""
+        for attempt in range(self.retries + 1):
+            waiter = asyncio.get_running_loop().create_future()
+            protocol.waiters[address] = waiter
+
+            await self.budget.acquire()
+            protocol.transport.sendto(HEADER_SIMPLE + request, address)
+
+            try:
+                return await asyncio.wait_for(waiter, self.timeout)
+
+            except TimeoutError:
+                protocol.forget(address)
+
+                if attempt >= self.retries:
+                    raise
+
+    async def _query(self, protocol: _ScannerProtocol, address: Tuple[str, int], a2s_protocol, challenge: int):
+        """Run A2S exchange including challenge rounds and parse response with python-a2s"""
+        for _ in range(MAX_CHALLENGE_ROUNDS):
+            response = await self._request(protocol, address, a2s_protocol.serialize_request(challenge))
+            reader = ByteReader(io.BytesIO(response), endian="<", encoding=ENCODING)
+            response_type = reader.read_uint8()
+
+            if response_type == A2S_CHALLENGE_RESPONSE:
+                challenge = reader.read_uint32()
+                continue
+
+            if not a2s_protocol.validate_response_type(response_type):
+                raise ScanError(f"Invalid response type: {hex(response_type)}")
+
+            return a2s_protocol.deserialize_response(reader, response_type, None)
+
+        raise ScanError("Server keeps sending challenge responses")
+
+    async def scan_endpoint(self, address: Tuple[str, int], players: bool = True) -> tuple:
+        """Info and players of one endpoint, players are None when not requested or server didn't answer"""
+        protocol = self.protocols[hash(address) % len(self.protocols)]
+
+        try:
+            info = await self._query(protocol, address, InfoProtocol, 0)
+            players_list = None
+
+            # Some servers don't answer players query, info is still valid
+            if players:
+                try:
+                    players_list = await self._query(protocol, address, PlayersProtocol, NO_CHALLENGE)
+
+                except (TimeoutError, ScanError) as error:
+                    logger.debug("Players of %s:%s failed: %r", *address, error)
+
+            return info, players_list
+
+        finally:
+            protocol.forget(address)
+
+    async def _resolve(self, address: Tuple[str, int]) -> Tuple[str, int]:
+        """Raw sockets need ip address, hostnames are resolved first"""
+        return await dns_resolver.resolver.resolve_address(address)
+
+    async def scan(self, endpoints: Iterable[Tuple[str, int]], players: bool = True) -> dict:
+        """Scan all endpoints, returns address: (info, players) or exception for every endpoint"""
+        await self.open()
+        endpoints = list(endpoints)
+        resolved = await asyncio.gather(*[self._resolve(address) for address in endpoints], return_exceptions=True)
+
+        # Endpoints resolving to the same ip and port are scanned once
+        unique_addresses = list({address for address in resolved if not isinstance(address, Exception)})
+        results = await asyncio.gather(*[self.scan_endpoint(address, players) for address in unique_addresses],
+                                       return_exceptions=True)
+        results = dict(zip(unique_addresses, results))
+
+        return {endpoint: address if isinstance(address, Exception) else results[address]
+                for endpoint, address in zip(endpoints, resolved)}
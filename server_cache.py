@@ -0,0 +1,214 @@
+import os
+import asyncio
+import logging
+import time
+import a2s
+import a2s_query
+import health
+import metrics
+import scanner
+import database_handler as db
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Callable, Tuple, Union
+
+# Cache and poller settings (seconds), snapshot is used for commands until it is older than SNAPSHOT_TTL
+load_dotenv()
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", 15))
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL", 45))
+MAX_SNAPSHOTS = int(os.getenv("MAX_SNAPSHOTS", 10000))
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """In-memory cache of the latest A2S responses with TTL and LRU eviction"""
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL, max_size: int = MAX_SNAPSHOTS):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._snapshots = OrderedDict()
+
+    def get(self, key: Tuple) -> Union[Any, None]:
+        """Return cached snapshot or None if it is missing or older than ttl"""
+        snapshot = self._snapshots.get(key)
+
+        if snapshot is None:
+            return None
+
+        stored_at, value = snapshot
+
+        if time.monotonic() - stored_at > self.ttl:
+            del self._snapshots[key]
+            return None
+
+        self._snapshots.move_to_end(key)
+
+        return value
+
+    def set(self, key: Tuple, value: Any):
+        """Store snapshot and evict least recently used ones over max_size"""
+        self._snapshots[key] = (time.monotonic(), value)
+        self._snapshots.move_to_end(key)
+
+        while len(self._snapshots) > self.max_size:
+            self._snapshots.popitem(last=False)
+
+    def retain(self, endpoints: set):
+        """Drop snapshots of endpoints which are no longer registered"""
+        for key in [key for key in self._snapshots if key[0] not in endpoints]:
+            del self._snapshots[key]
+
+    def __len__(self):
+        return len(self._snapshots)
+
+
+snapshots = SnapshotCache()
+
+# Client of poller worker process when the bot runs in more processes, see snapshot_service.py
+remote = None
+
+
+async def get_info(address: Tuple[str, int]):
+    """Server info from cache, or live query when the snapshot is stale"""
+    if remote is not None:
+        return await remote.get("info", address)
+
+    info = snapshots.get((address, "info"))
+    metrics.CACHE_REQUESTS.inc(cache="snapshot", result="miss" if info is None else "hit")
+
+    if info is None:
+        health.tracker.check(address)
+
+        try:
+            info = await a2s_query.server_info(address)
+
+        except (TimeoutError, OSError, a2s.BrokenMessageError):
+            health.tracker.record_failure(address)
+            raise
+
+        health.tracker.record_success(address, info)
+        snapshots.set((address, "info"), info)
+
+    return info
+
+
+async def get_players(address: Tuple[str, int]):
+    """Server players from cache, or live query when the snapshot is stale"""
+    if remote is not None:
+        return await remote.get("players", address)
+
+    players = snapshots.get((address, "players"))
+    metrics.CACHE_REQUESTS.inc(cache="snapshot", result="miss" if players is None else "hit")
+
+    if players is None:
+        health.tracker.check(address)
+
+        try:
+            players = await a2s_query.server_players(address)
+
+        except (TimeoutError, OSError, a2s.BrokenMessageError):
+            health.tracker.record_failure(address)
+            raise
+
+        health.tracker.record_success(address)
+        snapshots.set((address, "players"), players)
+
+    return players
+
+
+class ServerPoller:
+    """Background task polling every unique game server registered in any discord server"""
+
+    def __init__(self, cache: SnapshotCache = snapshots, interval: float = POLL_INTERVAL,
+                 a2s_scanner: scanner.A2SScanner = None, health_tracker: health.HealthTracker = health.tracker):
+        self.cache = cache
+        self.health = health_tracker
+        self.interval = interval
+        self.scanner = a2s_scanner or scanner.A2SScanner()
+        self.endpoints = set()
+        self.listeners = []
+        self.cycle_listeners = []
+        self.retainers = []
+        self._task = None
+
+    def add_listener(self, listener: Callable):
+        """Register coroutine called as listener(address, info, players) after every poll, None when it failed"""
+        self.listeners.append(listener)
+
+    def add_cycle_listener(self, listener: Callable):
+        """Register coroutine called as listener() after all servers were polled and their listeners notified"""
+        self.cycle_listeners.append(listener)
+
+    def add_retainer(self, retain: Callable):
+        """Register function called as retain(endpoints) after endpoints were refreshed, to drop removed ones"""
+        self.retainers.append(retain)
+
+    async def _notify(self, address: Tuple[str, int], info, players):
+        for listener in self.listeners:
+            try:
+                await listener(address, info, players)
+
+            except Exception:
+                logger.exception("Poll listener %r failed", listener)
+
+    async def poll_once(self):
+        """Refresh endpoint list from database and scan all of them except offline ones waiting for next probe"""
+        self.endpoints = await db.all_game_server_endpoints()
+        self.cache.retain(self.endpoints)
+        self.health.retain(self.endpoints)
+
+        for retain in self.retainers:
+            retain(self.endpoints)
+
+        with metrics.POLL_SECONDS.time():
+            results = await self.scanner.scan([address for address in self.endpoints
+                                               if self.health.should_query(address)])
+
+        for address, result in results.items():
+            info = players = None
+
+            if isinstance(result, Exception):
+                logger.debug("Polling %s:%s failed: %r", *address, result)
+                self.health.record_failure(address)
+
+            else:
+                info, players = result
+                self.health.record_success(address, info)
+                self.cache.set((address, "info"), info)
+
+                if players is not None:
+                    self.cache.set((address, "players"), players)
+
+            await self._notify(address, info, players)
+
+        for listener in self.cycle_listeners:
+            try:
+                await listener()
+
+            except Exception:
+                logger.exception("Poll cycle listener %r failed", listener)
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+
+            try:
+                await self.poll_once()
+
+            except Exception:
+                logger.exception("Polling game servers failed")
+
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+poller = ServerPoller()
@@ -0,0 +1,51 @@
+from bisect import bisect_left, insort
+from typing import Iterable
+
+
+class ServerNameIndex:
+    """Sorted game server names of every cached discord server for case-insensitive prefix search"""
+
+    def __init__(self):
+        self._guilds = {}
+
+    def is_loaded(self, guild_id: int) -> bool:
+        return guild_id in self._guilds
+
+    def load(self, guild_id: int, server_names: Iterable[str]):
+        self._guilds[guild_id] = sorted((server_name.casefold(), server_name) for server_name in server_names)
+
+    def forget(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def clear(self):
+        self._guilds.clear()
+
+    def add(self, guild_id: int, server_name: str):
+        """Add name to discord server which is already loaded, others are loaded complete on first search"""
+        names = self._guilds.get(guild_id)
+
+        if names is not None and (server_name.casefold(), server_name) not in names:
+            insort(names, (server_name.casefold(), server_name))
+
+    def remove(self, guild_id: int, server_name: str):
+        names = self._guilds.get(guild_id)
+
+        if names is not None and (server_name.casefold(), server_name) in names:
+            names.remove((server_name.casefold(), server_name))
+
+    def complete(self, guild_id: int, prefix: str, limit: int) -> list:
+        """At most limit names of discord server starting with prefix, in alphabetical order"""
+        names = self._guilds.get(guild_id, [])
+        prefix = prefix.casefold()
+        matches = []
+
+        for folded_name, server_name in names[bisect_left(names, (prefix,)):]:
+            if not folded_name.startswith(prefix) or len(matches) >= limit:
+                break
+
+            matches.append(server_name)
+
+        return matches
+
+
+index = ServerNameIndex()
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+import database_handler as db
+from datetime import datetime
+from typing import Tuple
+
+# How often is buffered playtime written to database and how often are discord servers tracking game server
+# looked up again (seconds)
+FLUSH_INTERVAL = 60.0
+GUILDS_REFRESH_INTERVAL = 300.0
+
+# Leaderboards of the top command
+LEADERBOARD_PERIODS = ("day", "week", "all")
+DEFAULT_LEADERBOARD_PERIOD = "week"
+LEADERBOARD_SIZE = 10
+
+logger = logging.getLogger(__name__)
+
+
+class SessionTracker:
+    """Detects joins and leaves of players between polls and adds their playtime to leaderboards in batches"""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.online = {}
+        self._playtime = {}
+        self._guilds = {}
+        self._task = None
+
+    async def record(self, address: Tuple[str, int], info, players):
+        """Poller listener adding playtime of players since previous poll of the server"""
+        if players is None:
+            return
+
+        previous = self.online.get(address)
+        current = {player.name: player.duration for player in players if player.name}
+        now = datetime.utcnow()
+
+        # Players missing in current poll left, they are forgotten with the previous poll
+        self.online[address] = current
+
+        # First poll of server only marks who is online, the bot doesn't know what they played before
+        if previous is None:
+            return
+
+        for name, duration in current.items():
+            last_duration = previous.get(name)
+
+            # Player joined since previous poll, or reconnected so the duration started from zero again
+            if last_duration is None or duration < last_duration:
+                seconds, sessions = duration, 1
+
+            else:
+                seconds, sessions = duration - last_duration, 0
+
+            playtime = self._playtime.setdefault((address, name), {"seconds": 0.0, "sessions": 0})
+            playtime["seconds"] += seconds
+            playtime["sessions"] += sessions
+            playtime["last_seen"] = now
+
+    def retain(self, endpoints: set):
+        """Forget online players and discord servers of endpoints which are no longer registered, buffered playtime
+        of them is still saved"""
+        for address in [address for address in self.online if address not in endpoints]:
+            del self.online[address]
+
+        for address in [address for address in self._guilds if address not in endpoints]:
+            del self._guilds[address]
+
+    async def _guilds_tracking(self, address: Tuple[str, int]) -> list:
+        """Discord servers which added game server, cached for GUILDS_REFRESH_INTERVAL"""
+        refreshed_at, guild_ids = self._guilds.get(address, (0.0, []))
+
+        if time.monotonic() - refreshed_at > GUILDS_REFRESH_INTERVAL:
+            guild_ids = await db.guilds_tracking_endpoint(*address)
+            self._guilds[address] = (time.monotonic(), guild_ids)
+
+        return guild_ids
+
+    async def flush(self):
+        """Add buffered playtime to server and discord server leaderboards with one bulk write each"""
+        if not self._playtime:
+            return
+
+        playtime, self._playtime = self._playtime, {}
+
+        try:
+            entries = []
+
+            for (address, name), player_playtime in playtime.items():
+                entries.append({"ip": address[0], "port": address[1], "name": name,
+                                "guild_ids": await self._guilds_tracking(address), **player_playtime})
+
+            await db.save_playtime(entries)
+
+        except Exception:
+            logger.exception("Saving playtime of %d players failed", len(playtime))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+
+tracker = SessionTracker()
@@ -0,0 +1,339 @@
+import os
+import hmac
+import json
+import asyncio
+import hashlib
+import itertools
+import logging
+import secrets
+import struct
+import a2s
+import health
+import alerts
+import discord
+import history
+import metrics
+import server_cache
+import sessions
+import dns_resolver
+import database_handler as db
+from dotenv import load_dotenv
+from typing import Tuple, Union
+
+# Bot processes started by launcher.py read snapshots from poller worker on SNAPSHOT_HOST:SNAPSHOT_PORT,
+# when port is 0 the bot polls game servers itself. Both sides prove they know SNAPSHOT_SECRET when connecting.
+load_dotenv()
+SNAPSHOT_HOST = os.getenv("SNAPSHOT_HOST", "127.0.0.1")
+SNAPSHOT_PORT = int(os.getenv("SNAPSHOT_PORT", 0))
+SNAPSHOT_SECRET = os.getenv("SNAPSHOT_SECRET", "")
+
+DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
+
+# Worker can run live query with retries when snapshot is missing, so the timeout is longer than one query
+REQUEST_TIMEOUT = 10.0
+HANDSHAKE_TIMEOUT = 5.0
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+_LENGTH = struct.Struct("!I")
+QUERIES = {"info": server_cache.get_info, "players": server_cache.get_players}
+INFO_TYPES = {"source": a2s.SourceInfo, "goldsrc": a2s.GoldSrcInfo}
+
+logger = logging.getLogger(__name__)
+
+
+class AuthenticationError(ConnectionError):
+    """Other side of snapshot connection doesn't know the secret"""
+
+
+async def _read_message(reader: asyncio.StreamReader):
+    length, = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+
+    if length > MAX_MESSAGE_SIZE:
+        raise ConnectionError(f"Snapshot message of {length} bytes is too long")
+
+    return json.loads(await reader.readexactly(length))
+
+
+def _write_message(writer: asyncio.StreamWriter, message: Union[dict, list]):
+    data = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(_LENGTH.pack(len(data)) + data)
+
+
+def _proof(secret: str, role: str, nonce: str) -> str:
+    """Role is part of the proof, so the worker's answer can't be sent back to it as client's proof"""
+    return hmac.new(secret.encode(), f"{role}:{nonce}".encode(), hashlib.sha256).hexdigest()
+
+
+def _encode_info(info) -> Union[dict, None]:
+    if info is None:
+        return None
+
+    info_type = "goldsrc" if isinstance(info, a2s.GoldSrcInfo) else "source"
+
+    return {"type": info_type, "fields": dict(info)}
+
+
+def _decode_info(data: Union[dict, None]):
+    if data is None:
+        return None
+
+    return INFO_TYPES[data["type"]](**data["fields"])
+
+
+def _encode_value(query_type: str, value):
+    if query_type == "info":
+        return _encode_info(value)
+
+    return [dict(player) for player in value]
+
+
+def _decode_value(query_type: str, data):
+    if query_type == "info":
+        return _decode_info(data)
+
+    return [a2s.Player(**player) for player in data]
+
+
+def _encode_health(endpoint_health: health.EndpointHealth) -> dict:
+    return {"failures": endpoint_health.failures, "failing_since": endpoint_health.failing_since,
+            "last_seen": endpoint_health.last_seen, "last_info": _encode_info(endpoint_health.last_info)}
+
+
+def _decode_health(data: dict) -> health.EndpointHealth:
+    endpoint_health = health.EndpointHealth()
+    endpoint_health.failures = data["failures"]
+    endpoint_health.failing_since = data["failing_since"]
+    endpoint_health.last_seen = data["last_seen"]
+    endpoint_health.last_info = _decode_info(data["last_info"])
+
+    return endpoint_health
+
+
+def _error_kind(error: Exception) -> str:
+    if isinstance(error, TimeoutError):
+        return "timeout"
+
+    if isinstance(error, dns_resolver.NameNotFoundError):
+        return "unresolvable"
+
+    if isinstance(error, a2s.BrokenMessageError):
+        return "broken"
+
+    return "error"
+
+
+def _raise_error(kind: str, message: str, address: Tuple[str, int]):
+    """Create error of the same kind as worker got, only data are sent so the exception isn't unpickled"""
+    if kind == "timeout":
+        raise TimeoutError(message)
+
+    if kind == "unresolvable":
+        raise dns_resolver.NameNotFoundError(address[0])
+
+    if kind == "broken":
+        raise a2s.BrokenMessageError(message)
+
+    raise OSError(message)
+
+
+def _check_secret(secret: str) -> str:
+    if not secret:
+        raise ValueError("SNAPSHOT_SECRET must be set, launcher.py generates it for its processes")
+
+    return secret
+
+
+class SnapshotServer:
+    """Answers snapshot requests of bot processes from snapshot cache of poller worker"""
+
+    def __init__(self, secret: str = SNAPSHOT_SECRET):
+        self.secret = _check_secret(secret)
+        self.server = None
+
+    async def _answer(self, writer: asyncio.StreamWriter, request_id: int, query_type: str, address: Tuple[str, int]):
+        try:
+            value = _encode_value(query_type, await QUERIES[query_type](address))
+            response = {"id": request_id, "status": "ok", "value": value}
+
+        # Health isn't argument of exception, so it is sent alone and exception is created again in bot process
+        except health.ServerOfflineError as error:
+            response = {"id": request_id, "status": "offline", "health": _encode_health(error.health)}
+
+        except Exception as error:
+            response = {"id": request_id, "status": "error", "kind": _error_kind(error), "message": str(error)}
+
+        _write_message(writer, response)
+        await writer.drain()
+
+    async def _authenticate(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        nonce = secrets.token_hex(16)
+        _write_message(writer, {"nonce": nonce})
+        hello = await asyncio.wait_for(_read_message(reader), HANDSHAKE_TIMEOUT)
+
+        if not hmac.compare_digest(str(hello.get("proof")), _proof(self.secret, "client", nonce)):
+            raise AuthenticationError("Snapshot client sent wrong proof of secret")
+
+        _write_message(writer, {"proof": _proof(self.secret, "server", str(hello.get("nonce")))})
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Requests of one bot process are answered concurrently, responses are matched by request id"""
+        tasks = set()
+
+        try:
+            await self._authenticate(reader, writer)
+
+            while True:
+                request = await _read_message(reader)
+                request_id, query_type = request["id"], request["query"]
+                ip, port = request["address"]
+
+                if query_type not in QUERIES:
+                    raise ValueError(f"Unknown snapshot query {query_type!r}")
+
+                task = asyncio.create_task(self._answer(writer, request_id, query_type, (str(ip), int(port))))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        except AuthenticationError as error:
+            logger.warning("Rejected snapshot connection: %s", error)
+
+        except (asyncio.IncompleteReadError, ConnectionError, TimeoutError):
+            pass
+
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            logger.warning("Closing snapshot connection after bad message: %r", error)
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            writer.close()
+
+    async def start(self, host: str = SNAPSHOT_HOST, port: int = SNAPSHOT_PORT) -> asyncio.AbstractServer:
+        self.server = await asyncio.start_server(self._handle, host, port)
+        logger.info("Snapshots are served on %s:%s", host, port)
+
+        return self.server
+
+
+class SnapshotClient:
+    """Reads snapshots from poller worker, all requests of bot process share one connection"""
+
+    def __init__(self, host: str = SNAPSHOT_HOST, port: int = SNAPSHOT_PORT, timeout: float = REQUEST_TIMEOUT,
+                 secret: str = SNAPSHOT_SECRET):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.secret = _check_secret(secret)
+        self._writer = None
+        self._pending = {}
+        self._request_ids = itertools.count()
+        self._connect_lock = asyncio.Lock()
+        self._reader_task = None
+
+    async def _authenticate(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Prove the secret to the worker and check the worker knows it too before trusting its answers"""
+        challenge = await _read_message(reader)
+        nonce = secrets.token_hex(16)
+        _write_message(writer, {"nonce": nonce, "proof": _proof(self.secret, "client", str(challenge.get("nonce")))})
+        await writer.drain()
+        answer = await _read_message(reader)
+
+        if not hmac.compare_digest(str(answer.get("proof")), _proof(self.secret, "server", nonce)):
+            raise AuthenticationError("Snapshot worker sent wrong proof of secret")
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+
+                try:
+                    await asyncio.wait_for(self._authenticate(reader, writer), HANDSHAKE_TIMEOUT)
+
+                # Worker closes connection when it doesn't accept the proof
+                except (asyncio.IncompleteReadError, ValueError) as error:
+                    writer.close()
+                    raise AuthenticationError("Snapshot worker rejected the connection") from error
+
+                except Exception:
+                    writer.close()
+                    raise
+
+                self._writer = writer
+                self._reader_task = asyncio.create_task(self._read_responses(reader, writer))
+
+        return self._writer
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                response = await _read_message(reader)
+                future = self._pending.pop(response["id"], None)
+
+                if future is not None and not future.done():
+                    future.set_result(response)
+
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError, TypeError) as error:
+            logger.warning("Connection to snapshot worker lost: %r", error)
+
+        finally:
+            writer.close()
+
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Snapshot worker disconnected"))
+
+            self._pending.clear()
+
+    async def get(self, query_type: str, address: Tuple[str, int]):
+        """Snapshot of server from worker, raises the same errors as server_cache in bot process"""
+        writer = await self._connect()
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        _write_message(writer, {"id": request_id, "query": query_type, "address": list(address)})
+
+        try:
+            response = await asyncio.wait_for(future, self.timeout)
+
+        finally:
+            self._pending.pop(request_id, None)
+
+        if response["status"] == "offline":
+            raise health.ServerOfflineError(_decode_health(response["health"]))
+
+        if response["status"] == "error":
+            _raise_error(response["kind"], response["message"], address)
+
+        return _decode_value(query_type, response["value"])
+
+
+async def run_worker():
+    """Poll game servers, record history and playtime, send alerts and serve snapshots to bot processes"""
+    await db.connect()
+
+    # Alerts are sent over HTTP API only, worker doesn't connect to gateway
+    alerts_client = discord.Client(intents=discord.Intents.none())
+    await alerts_client.login(DISCORD_TOKEN)
+    alerts.manager.client = alerts_client
+    await alerts.manager.load()
+
+    server_cache.poller.add_listener(history.recorder.record)
+    server_cache.poller.add_listener(sessions.tracker.record)
+    server_cache.poller.add_listener(alerts.manager.record)
+    server_cache.poller.add_cycle_listener(alerts.manager.flush)
+    server_cache.poller.add_retainer(sessions.tracker.retain)
+    server_cache.poller.start()
+    history.recorder.start()
+    sessions.tracker.start()
+    server = await SnapshotServer().start()
+
+    await metrics.start_server()
+
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
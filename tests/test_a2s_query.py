@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import a2s_query
+from fake_a2s import start_fake_servers
+
+
+class QueryTest(unittest.IsolatedAsyncioTestCase):
+    """Queries against local fake A2S servers, one answers and the other one never does"""
+
+    async def asyncSetUp(self):
+        (self.online_transport, online), = await start_fake_servers(1)
+        (self.silent_transport, silent), = await start_fake_servers(1, loss=1.0)
+        self.online_address = online.address
+        self.silent_address = silent.address
+
+    async def asyncTearDown(self):
+        self.online_transport.close()
+        self.silent_transport.close()
+
+    async def test_server_info(self):
+        info = await a2s_query.server_info(self.online_address)
+
+        self.assertEqual(info.map_name, "de_dust2")
+        self.assertEqual(info.player_count, 10)
+
+    async def test_server_players(self):
+        players = await a2s_query.server_players(self.online_address)
+
+        self.assertEqual(len(players), 10)
+
+    async def test_unresponsive_server_times_out(self):
+        with self.assertRaises(TimeoutError):
+            await a2s_query.server_info(self.silent_address, timeout=0.3, retries=0)
+
+    async def test_unresponsive_server_does_not_delay_other_queries(self):
+        silent_query = asyncio.create_task(a2s_query.server_info(self.silent_address, timeout=2.0, retries=0))
+        started = time.perf_counter()
+        info = await a2s_query.server_info(self.online_address)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(info.map_name, "de_dust2")
+        self.assertLess(elapsed, 0.5)
+        self.assertFalse(silent_query.done())
+
+        with self.assertRaises(TimeoutError):
+            await silent_query
+
+
+if __name__ == "__main__":
+    unittest.main()
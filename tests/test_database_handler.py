@@ -0,0 +1,71 @@
+import os
+import sys
+import asyncio
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import database_handler as db
+import memory_db
+
+
+class GuildCacheTest(unittest.IsolatedAsyncioTestCase):
+    """Cache of game servers of discord servers against in-memory collections"""
+
+    async def asyncSetUp(self):
+        memory_db.install()
+        await db.create_default_config(1)
+        await db.add_game_server(1, "first", "10.0.0.1", 27015, "First server")
+        db.clear_guild_cache()
+
+        # Load reads the database and then waits, so writes can run before it finishes
+        self.find_guild_servers = db._find_guild_servers
+        self.loaded = threading.Event()
+        self.release = threading.Event()
+        self.loads = 0
+
+        def paused_find_guild_servers(guild_id: int) -> dict:
+            self.loads += 1
+            game_servers = self.find_guild_servers(guild_id)
+            self.loaded.set()
+            self.release.wait(5)
+
+            return game_servers
+
+        db._find_guild_servers = paused_find_guild_servers
+
+    async def asyncTearDown(self):
+        self.release.set()
+        db._find_guild_servers = self.find_guild_servers
+        db.clear_guild_cache()
+
+    async def test_load_running_during_add_is_not_cached(self):
+        load = asyncio.create_task(db.all_game_servers(1))
+        await asyncio.to_thread(self.loaded.wait, 5)
+        await db.add_game_server(1, "second", "10.0.0.2", 27015, "Second server")
+        self.release.set()
+
+        self.assertEqual(await load, ["first"])
+        self.assertEqual(sorted(await db.all_game_servers(1)), ["first", "second"])
+
+    async def test_load_running_during_delete_is_not_cached(self):
+        load = asyncio.create_task(db.all_game_servers(1))
+        await asyncio.to_thread(self.loaded.wait, 5)
+        await db.del_game_server(1, "first")
+        self.release.set()
+        await load
+
+        self.assertEqual(await db.all_game_servers(1), [])
+
+    async def test_concurrent_loads_are_shared(self):
+        self.release.set()
+        results = await asyncio.gather(*[db.all_game_servers(1) for _ in range(5)])
+
+        self.assertEqual(results, [["first"]] * 5)
+        self.assertEqual(self.loads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
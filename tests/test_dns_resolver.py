@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dns_resolver
+
+
+class FakeBackend:
+    """Answers lookups from records, record is (addresses, ttl) or exception raised by the lookup"""
+
+    def __init__(self, records: dict):
+        self.records = records
+        self.lookups = 0
+
+    async def __call__(self, host: str):
+        self.lookups += 1
+        await asyncio.sleep(0.01)
+        record = self.records[host]
+
+        if isinstance(record, Exception):
+            raise record
+
+        return record
+
+
+class DNSCacheTest(unittest.IsolatedAsyncioTestCase):
+    """Cache of resolved names with pluggable backend"""
+
+    def cache_with(self, records: dict) -> dns_resolver.DNSCache:
+        self.backend = FakeBackend(records)
+
+        return dns_resolver.DNSCache(self.backend)
+
+    def expire(self, cache: dns_resolver.DNSCache, host: str):
+        addresses, _, _ = cache._entries[host]
+        cache._entries[host] = (addresses, time.monotonic() - 1, time.monotonic() - 1)
+
+    async def test_ip_address_is_not_resolved(self):
+        cache = self.cache_with({})
+
+        self.assertEqual(await cache.resolve("10.0.0.1"), "10.0.0.1")
+        self.assertEqual(self.backend.lookups, 0)
+
+    async def test_ttl_is_clamped(self):
+        cache = self.cache_with({"short.example.com": (["10.0.0.1"], 1), "long.example.com": (["10.0.0.2"], 10 ** 6)})
+        await cache.resolve("short.example.com")
+        await cache.resolve("long.example.com")
+        now = time.monotonic()
+
+        self.assertAlmostEqual(cache._entries["short.example.com"][1] - now, dns_resolver.MIN_TTL, delta=1)
+        self.assertAlmostEqual(cache._entries["long.example.com"][1] - now, dns_resolver.MAX_TTL, delta=1)
+
+    async def test_cached_name_is_not_looked_up_again(self):
+        cache = self.cache_with({"game.example.com": (["10.0.0.1"], 300)})
+        addresses = await asyncio.gather(*[cache.resolve("game.example.com") for _ in range(5)])
+        addresses.append(await cache.resolve("game.example.com"))
+
+        self.assertEqual(set(addresses), {"10.0.0.1"})
+        self.assertEqual(self.backend.lookups, 1)
+
+    async def test_missing_name_is_cached(self):
+        cache = self.cache_with({"missing.example.com": dns_resolver.NameNotFoundError("missing.example.com")})
+
+        for _ in range(3):
+            with self.assertRaises(dns_resolver.NameNotFoundError):
+                await cache.resolve("missing.example.com")
+
+        self.assertEqual(self.backend.lookups, 1)
+
+    async def test_expired_addresses_are_used_when_backend_fails(self):
+        cache = self.cache_with({"game.example.com": (["10.0.0.1"], 300)})
+        await cache.resolve("game.example.com")
+        self.expire(cache, "game.example.com")
+        self.backend.records["game.example.com"] = OSError("Resolver is unavailable")
+
+        self.assertEqual(await cache.resolve("game.example.com"), "10.0.0.1")
+
+    async def test_failed_lookup_without_cached_addresses_raises(self):
+        cache = self.cache_with({"game.example.com": OSError("Resolver is unavailable")})
+
+        with self.assertRaises(OSError):
+            await cache.resolve("game.example.com")
+
+    async def test_used_name_is_refreshed_before_expiry(self):
+        cache = self.cache_with({"game.example.com": (["10.0.0.1"], 0.2)})
+
+        with mock.patch.object(dns_resolver, "MIN_TTL", 0.1):
+            await cache.resolve("game.example.com")
+            self.backend.records["game.example.com"] = (["10.0.0.2"], 300)
+            await cache.resolve("game.example.com")
+            await asyncio.sleep(0.3)
+
+        self.assertEqual(self.backend.lookups, 2)
+        self.assertEqual(await cache.resolve("game.example.com"), "10.0.0.2")
+
+    async def test_unused_name_is_not_refreshed(self):
+        cache = self.cache_with({"game.example.com": (["10.0.0.1"], 0.2)})
+
+        with mock.patch.object(dns_resolver, "MIN_TTL", 0.1):
+            await cache.resolve("game.example.com")
+            await asyncio.sleep(0.3)
+
+        self.assertEqual(self.backend.lookups, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import socket
+import asyncio
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+
+def free_port() -> int:
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+
+        return free_socket.getsockname()[1]
+
+
+class MetricsServerTest(unittest.IsolatedAsyncioTestCase):
+    """Prometheus endpoint configured by environment set after metrics module was imported"""
+
+    async def test_port_is_read_when_server_starts(self):
+        port = free_port()
+
+        with mock.patch.dict(os.environ, {"METRICS_HOST": "127.0.0.1", "METRICS_PORT": str(port)}):
+            server = await metrics.start_server()
+
+        self.assertIsNotNone(server)
+
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            response = (await reader.read()).decode()
+            writer.close()
+
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+        self.assertIn("gamestatsbot_command_seconds", response)
+
+    async def test_server_is_disabled_without_port(self):
+        with mock.patch.dict(os.environ, {"METRICS_PORT": "0"}):
+            self.assertIsNone(await metrics.start_server())
+
+
+if __name__ == "__main__":
+    unittest.main()
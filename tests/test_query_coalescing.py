@@ -0,0 +1,44 @@
+import os
+import sys
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import a2s_query
+from fake_a2s import start_fake_servers
+
+
+class CoalescingTest(unittest.IsolatedAsyncioTestCase):
+    """Concurrent identical queries share one UDP exchange"""
+
+    async def asyncSetUp(self):
+        (self.transport, fake_server), = await start_fake_servers(1)
+        self.address = fake_server.address
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    async def test_concurrent_queries_are_coalesced(self):
+        sent = a2s_query.query_counters["sent"]
+        coalesced = a2s_query.query_counters["coalesced"]
+        results = await asyncio.gather(*[a2s_query.server_info(self.address) for _ in range(10)])
+
+        self.assertEqual(len({info.map_name for info in results}), 1)
+        self.assertEqual(a2s_query.query_counters["sent"] - sent, 1)
+        self.assertEqual(a2s_query.query_counters["coalesced"] - coalesced, 9)
+
+    async def test_cancelled_caller_does_not_cancel_query_of_others(self):
+        cancelled = asyncio.create_task(a2s_query.server_info(self.address))
+        waiting = asyncio.create_task(a2s_query.server_info(self.address))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        info = await waiting
+
+        self.assertEqual(info.map_name, "de_dust2")
+
+
+if __name__ == "__main__":
+    unittest.main()
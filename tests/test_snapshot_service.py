@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import health
+import server_cache
+import snapshot_service
+from fake_a2s import start_fake_servers
+
+
+class SnapshotServiceTest(unittest.IsolatedAsyncioTestCase):
+    """Bot process reading snapshots from worker over local socket"""
+
+    async def asyncSetUp(self):
+        (self.transport, fake_server), = await start_fake_servers(1)
+        self.address = fake_server.address
+        self.server = await snapshot_service.SnapshotServer(secret="secret").start("127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        self.transport.close()
+        server_cache.snapshots = server_cache.SnapshotCache()
+        health.tracker.endpoints.clear()
+
+    async def test_info_and_players(self):
+        client = snapshot_service.SnapshotClient("127.0.0.1", self.port, secret="secret")
+        info = await client.get("info", self.address)
+        players = await client.get("players", self.address)
+
+        self.assertEqual(info.map_name, "de_dust2")
+        self.assertEqual(len(players), 10)
+        self.assertEqual(players[0].name, "player0")
+
+    async def test_offline_server_health(self):
+        client = snapshot_service.SnapshotClient("127.0.0.1", self.port, secret="secret")
+        address = ("127.0.0.1", 1)
+
+        for _ in range(health.FAILURE_THRESHOLD):
+            with self.assertRaises(OSError):
+                await client.get("info", address)
+
+        with self.assertRaises(health.ServerOfflineError) as raised:
+            await client.get("info", address)
+
+        self.assertIsNotNone(raised.exception.health.failing_since)
+
+    async def test_wrong_secret_is_rejected(self):
+        client = snapshot_service.SnapshotClient("127.0.0.1", self.port, secret="wrong")
+
+        with self.assertRaises(snapshot_service.AuthenticationError):
+            await client.get("info", self.address)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import io
+import os
+import asyncio
+import logging
+import time
+from typing import Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+# Pillow is in requirements, without it installed thumbnails are still sent but in original size
+try:
+    from PIL import Image
+
+except ImportError:
+    Image = None
+
+SCRIPT_DIRECTORY = os.path.abspath(os.path.dirname(__file__))
+MAP_THUMBNAILS_DIR = f'{SCRIPT_DIRECTORY}/map-thumbnails/'
+NOT_ALLOWED_CHAR_IN_DIR = ('\\', '/', ':', '*', '?', '"', '<', '>', '|')
+ALLOWED_PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+# Size of image in embed, thumbnails are shrunk to it when Pillow is installed
+THUMBNAIL_SIZE = (400, 225)
+RELOAD_CHECK_INTERVAL = 60.0
+
+# How long uploaded thumbnail url is reused when discord doesn't say when it expires (seconds)
+CDN_URL_MAX_AGE = 12 * 3600
+CDN_URL_EXPIRY_MARGIN = 3600
+
+logger = logging.getLogger(__name__)
+
+
+def game_key(game: str) -> str:
+    """Game name without characters not allowed in directory names, lowercase"""
+    return ''.join([char for char in game if char not in NOT_ALLOWED_CHAR_IN_DIR]).lower()
+
+
+def map_key(map_name: str) -> str:
+    """Map name without workshop prefix like workshop/123456789/de_dust2, lowercase"""
+    return map_name.replace('\\', '/').rsplit('/', 1)[-1].lower()
+
+
+def prepare_image(path: str) -> Tuple[str, bytes]:
+    """Read image and shrink it to embed size, returns filename and bytes"""
+    filename = os.path.basename(path)
+
+    if Image is None:
+        with open(path, 'rb') as image_file:
+            return filename, image_file.read()
+
+    with Image.open(path) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        image_bytes = io.BytesIO()
+        image.convert('RGB').save(image_bytes, format='JPEG', quality=85, optimize=True)
+
+    return f"{os.path.splitext(filename)[0]}.jpg", image_bytes.getvalue()
+
+
+class Thumbnail:
+    """Prepared map thumbnail and discord url of its last upload"""
+
+    def __init__(self, path: str, filename: str, data: bytes):
+        self.path = path
+        self.filename = filename
+        self.data = data
+        self.cdn_url = None
+        self.cdn_url_expires = 0.0
+
+    def valid_cdn_url(self) -> Union[str, None]:
+        """Url of uploaded thumbnail if it didn't expire"""
+        if self.cdn_url and time.time() < self.cdn_url_expires:
+            return self.cdn_url
+
+        return None
+
+    def set_cdn_url(self, url: str):
+        """Remember url of uploaded thumbnail, signed discord urls contain expiry time in ex parameter"""
+        expires = parse_qs(urlparse(url).query).get("ex")
+
+        try:
+            self.cdn_url_expires = int(expires[0], 16) - CDN_URL_EXPIRY_MARGIN
+
+        except (TypeError, ValueError):
+            self.cdn_url_expires = time.time() + CDN_URL_MAX_AGE
+
+        self.cdn_url = url
+
+
+class ThumbnailIndex:
+    """Index of map thumbnails by game and map name built from thumbnails directory"""
+
+    def __init__(self, directory: str = MAP_THUMBNAILS_DIR):
+        self.directory = directory
+        self.thumbnails = {}
+        self._directory_state = None
+        self._task = None
+
+    def _scan_directory_state(self) -> tuple:
+        """Modification times of thumbnails directory and game directories"""
+        state = [(self.directory, os.stat(self.directory).st_mtime_ns)]
+
+        for entry in os.scandir(self.directory):
+            if entry.is_dir():
+                state.append((entry.name, entry.stat().st_mtime_ns))
+
+        return tuple(sorted(state))
+
+    def load(self):
+        """Build index from thumbnails directory"""
+        directory_state = self._scan_directory_state()
+        thumbnails = {}
+
+        for game_dir in os.scandir(self.directory):
+            if not game_dir.is_dir():
+                continue
+
+            for entry in os.scandir(game_dir.path):
+                map_name, extension = os.path.splitext(entry.name)
+                key = (game_key(game_dir.name), map_key(map_name))
+
+                if extension.lower() not in ALLOWED_PHOTO_EXTENSIONS:
+                    continue
+
+                # When more images of the same map exist, use extension which is first in allowed extensions
+                if key in thumbnails:
+                    current_extension = os.path.splitext(thumbnails[key].path)[1].lower()
+
+                    if ALLOWED_PHOTO_EXTENSIONS.index(current_extension) <= ALLOWED_PHOTO_EXTENSIONS.index(
+                            extension.lower()):
+                        continue
+
+                try:
+                    thumbnails[key] = Thumbnail(entry.path, *prepare_image(entry.path))
+
+                except OSError:
+                    logger.warning("Thumbnail %s can't be loaded", entry.path)
+
+        self.thumbnails = thumbnails
+        self._directory_state = directory_state
+
+    def reload_if_changed(self) -> bool:
+        """Rebuild index when file was added or removed from thumbnails directory"""
+        if self._scan_directory_state() != self._directory_state:
+            self.load()
+            return True
+
+        return False
+
+    def find(self, game: str, map_name: str) -> Union[Thumbnail, None]:
+        """Thumbnail of game map or None"""
+        return self.thumbnails.get((game_key(game), map_key(map_name)))
+
+    async def watch(self, interval: float = RELOAD_CHECK_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                if await asyncio.to_thread(self.reload_if_changed):
+                    logger.info("Thumbnails reloaded, %d thumbnails found", len(self.thumbnails))
+
+            except OSError:
+                logger.exception("Reloading thumbnails failed")
+
+    async def start(self):
+        """Load index without blocking event loop and watch directory for changes"""
+        await asyncio.to_thread(self.load)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.watch())
+
+
+index = ThumbnailIndex()
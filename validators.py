@@ -1,7 +1,11 @@
 import ipaddress
+import a2s
 import discord
 import re
-from embeds import send_embed
+import health
+import dns_resolver
+import metrics
+from embeds import send_embed, send_offline_embed
 import database_handler as db
 
 ERROR_COLOR = discord.Color.red()
@@ -30,6 +34,16 @@ def validate_ip(ip: str) -> bool:
         return False
 
 
+async def validate_resolvable(host: str) -> bool:
+    """Validate if domain name resolves to ip address"""
+    try:
+        await dns_resolver.resolver.resolve(host)
+        return True
+
+    except OSError:
+        return False
+
+
 def validate_port(port) -> bool:
     """Validate if port is valid"""
     if 0 < int(port) < 65535:
@@ -56,14 +70,18 @@ def validate_user_server(func):
             is_valid_port = validate_port(port)
             is_valid_domain = validate_domain(server_ip)
             is_valid_description = len(server_description) < 35
-            server_exists = db.find_game_server(ctx.guild.id, server_name)
+            is_resolvable = is_valid_ip or (is_valid_domain and await validate_resolvable(ip))
+            server_exists = await db.find_game_server(ctx.guild.id, server_name)
 
-            if (is_valid_ip or is_valid_domain) and (is_valid_port and not server_exists and is_valid_description):
+            if is_resolvable and (is_valid_port and not server_exists and is_valid_description):
                 await func(ctx, server_name, server_ip, server_description)
 
             elif not is_valid_ip and not is_valid_domain:
                 await send_embed(ctx, title="Your ip address is not valid", color=ERROR_COLOR)
 
+            elif not is_resolvable:
+                await send_embed(ctx, title="Your domain name can't be resolved", color=ERROR_COLOR)
+
             elif not is_valid_port:
                 await send_embed(ctx, title="Your port is not valid", color=ERROR_COLOR)
 
@@ -81,13 +99,37 @@ def validate_user_server(func):
     return wrapper
 
 
-def validate_server_argument(func):
-    """Decorator that checks server argument that user wrote and add server info from database to function"""
+async def _send_server_offline(ctx, func, server, error: Exception, error_name: str):
+    metrics.COMMAND_ERRORS.inc(command=ctx.command.qualified_name if ctx.command else func.__name__, error=error_name)
+    server_health = getattr(error, "health", None)
+
+    if server_health is None and server:
+        server_health = health.tracker.get((server["ip"], server["port"]))
+
+    if server_health:
+        await send_offline_embed(ctx, failing_since=server_health.failing_since,
+                                 last_seen=server_health.last_seen, last_info=server_health.last_info)
+
+    else:
+        await send_embed(ctx, title="Server is offline", color=ERROR_COLOR)
+
+
+def validate_server_argument(func=None, pass_args: bool = False):
+    """Decorator that checks server argument that user wrote and add server info from database to function,
+    arguments after server name are passed only with pass_args and only as many as the function takes"""
+    if func is None:
+        return lambda func: validate_server_argument(func, pass_args)
+
+    # Parameters after ctx, server name and server info
+    max_args = func.__code__.co_argcount - 3 if pass_args else 0
+
+    async def wrapper(ctx, server_name: str = None, *args):
+        server = None
+        args = args[:max_args]
 
-    async def wrapper(ctx, server_name: str = None):
         try:
             guild_id = ctx.guild.id
-            game_servers = db.all_game_servers(guild_id)
+            game_servers = await db.all_game_servers(guild_id)
 
             if not server_name and len(game_servers) > 1:
                 all_servers = ', '.join([server for server in game_servers])
@@ -97,14 +139,14 @@ def validate_server_argument(func):
             elif not server_name and len(game_servers) == 1:
                 server_name = game_servers[0]
 
-                server = db.find_game_server(guild_id, server_name)
+                server = await db.find_game_server(guild_id, server_name)
 
-                await func(ctx, server_name, server)
+                await func(ctx, server_name, server, *args)
 
             elif server_name in game_servers and len(game_servers) >= 1:
-                server = db.find_game_server(guild_id, server_name)
+                server = await db.find_game_server(guild_id, server_name)
 
-                await func(ctx, server_name, server)
+                await func(ctx, server_name, server, *args)
 
             elif server_name not in game_servers:
                 await send_embed(ctx, title="Server not found", color=ERROR_COLOR)
@@ -112,8 +154,22 @@ def validate_server_argument(func):
             else:
                 await send_embed(ctx, title="Sorry, something went wrong", color=ERROR_COLOR)
 
-        except TimeoutError:
-            await send_embed(ctx, title="Server is offline", color=ERROR_COLOR)
+        # Show when the server went offline and what was on it when it was seen last time
+        except TimeoutError as error:
+            error_name = "offline" if isinstance(error, health.ServerOfflineError) else "timeout"
+            await _send_server_offline(ctx, func, server, error, error_name)
+
+        # Domain name of the server was deleted or it lost its address
+        except dns_resolver.NameNotFoundError:
+            metrics.COMMAND_ERRORS.inc(command=ctx.command.qualified_name if ctx.command else func.__name__,
+                                       error="unresolvable")
+            await send_embed(ctx, title="Server address can't be resolved", color=ERROR_COLOR,
+                             description=f"Domain name **{server['ip']}** doesn't exist anymore, "
+                                         f"the server is offline")
+
+        # Refused connection, unreachable network or garbage response, server is offline for the user too
+        except (OSError, a2s.BrokenMessageError) as error:
+            await _send_server_offline(ctx, func, server, error, metrics.error_type(error))
 
     return wrapper
 
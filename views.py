@@ -0,0 +1,78 @@
+import math
+import discord
+import embeds as emb
+
+# Buttons of player list work for VIEW_TIMEOUT seconds after the last interaction, then the view is dropped
+VIEW_TIMEOUT = 180.0
+
+
+class PlayersView(discord.ui.View):
+    """Player list with pages and sorting, pages are rendered on demand from one players snapshot"""
+
+    def __init__(self, players: list, author_id: int, per_page: int = emb.PLAYERS_PER_PAGE,
+                 timeout: float = VIEW_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.players = players
+        self.author_id = author_id
+        self.per_page = per_page
+        self.sort = "score"
+        self.page = 0
+        self.message = None
+        self._sorted = {}
+        self.player_count = len(self.sorted_players())
+        self.page_count = max(1, math.ceil(self.player_count / per_page))
+
+    def sorted_players(self) -> list:
+        """Players in current order, every order is sorted only once"""
+        if self.sort not in self._sorted:
+            self._sorted[self.sort] = emb.sort_players(self.players, self.sort)
+
+        return self._sorted[self.sort]
+
+    def render(self) -> discord.Embed:
+        """Embed of current page"""
+        start = self.page * self.per_page
+        columns = emb.players_columns(self.sorted_players()[start:start + self.per_page])
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+        return emb.build_players_list_embed(*columns, footer=f"Page {self.page + 1}/{self.page_count}, "
+                                                             f"sorted by {self.sort}")
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id == self.author_id:
+            return True
+
+        await interaction.response.send_message("Only the user who sent the command can change this list",
+                                                ephemeral=True)
+        return False
+
+    async def _show(self, interaction: discord.Interaction):
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(emoji="◀️", label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(emoji="▶️", label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = min(self.page_count - 1, self.page + 1)
+        await self._show(interaction)
+
+    @discord.ui.select(placeholder="Sort by", options=[discord.SelectOption(label="Score", value="score"),
+                                                      discord.SelectOption(label="Play time", value="playtime"),
+                                                      discord.SelectOption(label="Name", value="name")])
+    async def sort_select(self, interaction: discord.Interaction, select: discord.ui.Select):
+        self.sort = select.values[0]
+        self.page = 0
+        await self._show(interaction)
+
+    async def on_timeout(self):
+        # Buttons don't work anymore, so they are removed from message
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+
+            except discord.HTTPException:
+                pass